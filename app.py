@@ -2,13 +2,60 @@
 # Subscribe YouTube Channel For Amazing Bot https://youtube.com/@Tech_VJ
 # Ask Doubt on telegram @KingVJ01
 
-from flask import Flask
+import os
+import time
+from flask import Flask, Response
+from info import METRICS_FILE, METRICS_INTERVAL, WORKERS
 app = Flask(__name__)
 
 @app.route('/')
 def hello_world():
     return 'TechVJ'
 
+def _merge(texts):
+    """Join several expositions, keeping each metric's samples together"""
+    families = {}
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                family = families.setdefault(line.split()[2], [line, None, []])
+            elif line.startswith("# TYPE "):
+                family[1] = line
+            elif line:
+                family[2].append(line)
+    lines = []
+    for help, type, samples in families.values():
+        lines += [help, type] + samples
+    return "\n".join(lines) + "\n"
+
+@app.route('/metrics')
+def metrics():
+    # Written every METRICS_INTERVAL seconds by the bot process, or by
+    # each worker to its own file
+    if WORKERS:
+        paths = {str(index): f"{METRICS_FILE}.worker{index}" for index in range(WORKERS)}
+    else:
+        paths = {None: METRICS_FILE}
+    texts, ages = [], {}
+    for worker, path in paths.items():
+        try:
+            with open(path) as f:
+                texts.append(f.read())
+            ages[worker] = time.time() - os.path.getmtime(path)
+        except OSError:
+            continue
+    if not texts:
+        return Response("bot metrics not available\n", status=503, mimetype="text/plain")
+    age = "# HELP rmc_metrics_age_seconds Seconds since the bot last wrote metrics\n"
+    age += "# TYPE rmc_metrics_age_seconds gauge\n"
+    for worker, seconds in ages.items():
+        label = f'{{worker="{worker}"}}' if worker is not None else ""
+        age += f"rmc_metrics_age_seconds{label} {seconds:.1f}\n"
+    body = _merge(texts + [age])
+    status = 200 if min(ages.values()) < METRICS_INTERVAL * 4 else 503
+    return Response(body, status=status, mimetype="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
     app.run()
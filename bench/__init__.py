@@ -0,0 +1 @@
+# Offline benchmarks, see bench/__main__.py
@@ -0,0 +1,142 @@
+"""Offline benchmarks of the plugin handlers
+
+    python -m bench                         every scenario
+    python -m bench search fsub --ops 2000  some of them
+    python -m bench --save base.json        keep results
+    python -m bench --baseline base.json    fail on regressions
+
+Telegram is replaced by bench.telegram.FakeClient and Mongo by the
+in-memory store in bench.mongo. Each scenario runs in its own process
+so caches and counters start cold every time. The info.py environment
+variables apply as usual, e.g. BROADCAST_RATE or SEARCH_USER_LIMIT.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+from bench.telegram import FakeClient
+
+# Kept in step with bench.scenarios.SCENARIOS, which cannot be imported
+# before bench.mongo.install()
+NAMES = ["search", "fsub", "broadcast", "connect"]
+
+def _percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def summarize(latencies, elapsed, extra, bot):
+    ordered = sorted(latencies)
+    return {
+        "ops": len(ordered),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 1),
+        "api_calls": dict(bot.calls),
+        "floodwaits": dict(bot.floodwaits),
+        **extra
+    }
+
+def run_child(args):
+    """Run one scenario in this process and print its summary as JSON"""
+    from bench import mongo
+    mongo.install()
+
+    from bench.scenarios import run
+
+    bot = FakeClient.from_args(args)
+    latencies, elapsed, extra = asyncio.run(
+        run(args.scenarios[0], bot, args.ops, args.concurrency, args.seed)
+    )
+    print(json.dumps(summarize(latencies, elapsed, extra, bot)))
+
+def run_all(args):
+    results = {}
+    for name in args.scenarios:
+        argv = [sys.executable, "-m", "bench", name, "--child"] + _forwarded(args)
+        proc = subprocess.run(argv, capture_output=True, text=True, cwd=os.getcwd())
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr)
+            raise SystemExit(f"Scenario {name} failed")
+        results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+        _print(name, results[name])
+    return results
+
+def _forwarded(args):
+    return [
+        "--ops", str(args.ops), "--concurrency", str(args.concurrency),
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--floodwait-rate", str(args.floodwait_rate),
+        "--floodwait-seconds", str(args.floodwait_seconds),
+        "--members", str(args.members), "--seed", str(args.seed)
+    ]
+
+def _print(name, result):
+    calls = ", ".join(f"{method}={count}" for method, count in sorted(result["api_calls"].items()))
+    print(
+        f"{name:<10} {result['ops']:>6} ops  {result['seconds']:>7.2f}s  {result['throughput']:>8.1f}/s  "
+        f"p50 {result['p50_ms']:>7.1f}  p95 {result['p95_ms']:>7.1f}  p99 {result['p99_ms']:>7.1f} ms"
+    )
+    print(f"{'':<10} calls: {calls or '-'}")
+    extra = {
+        k: v for k, v in result.items()
+        if k not in ("ops", "seconds", "throughput", "p50_ms", "p95_ms", "p99_ms", "api_calls")
+    }
+    print(f"{'':<10} {json.dumps(extra)}")
+
+def compare(results, baseline, tolerance):
+    """Scenarios whose p95 or throughput got worse than tolerance allows"""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        if old["p95_ms"] and result["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {old['p95_ms']} -> {result['p95_ms']} ms")
+        if result["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old['throughput']} -> {result['throughput']}/s")
+        for method, count in result["api_calls"].items():
+            before = old["api_calls"].get(method, 0)
+            if count > before * (1 + tolerance) + 1:
+                regressions.append(f"{name}: {method} calls {before} -> {count}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Offline handler benchmarks")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario", help=f"any of {', '.join(NAMES)}")
+    parser.add_argument("--ops", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    FakeClient.add_arguments(parser)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved earlier")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.scenarios = args.scenarios or NAMES
+    unknown = set(args.scenarios) - set(NAMES)
+    if unknown:
+        parser.error(f"unknown scenario {', '.join(sorted(unknown))}")
+
+    if args.child:
+        logging.basicConfig(level=logging.ERROR)
+        return run_child(args)
+
+    results = run_all(args)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
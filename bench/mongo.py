@@ -0,0 +1,534 @@
+import copy
+import sys
+import types
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+
+class Unsupported(Exception):
+    """A query, update or pipeline feature the bench store does not implement
+
+    Raised instead of guessing, so a scenario that starts using a new
+    operator fails loudly rather than measuring the wrong thing.
+    """
+
+class Result:
+    """Stands in for the pymongo result classes, only the fields callers read"""
+
+    def __init__(self, **fields):
+        self.acknowledged = True
+        self.inserted_id = None
+        self.inserted_ids = []
+        self.matched_count = 0
+        self.modified_count = 0
+        self.upserted_id = None
+        self.upserted_count = 0
+        self.deleted_count = 0
+        self.__dict__.update(fields)
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+def _words(text):
+    return set(str(text or "").lower().split())
+
+def _text_score(doc, search):
+    return len(_words(search) & _words(doc.get("text")))
+
+def _compare(value, op, arg):
+    values = value if isinstance(value, list) else [value]
+    if op == "$in":
+        return any(v in arg for v in values)
+    if op == "$nin":
+        return not any(v in arg for v in values)
+    if op == "$ne":
+        return arg not in values
+    if op == "$exists":
+        return (value is not None) == bool(arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        def ok(v):
+            try:
+                if op == "$gt":
+                    return v > arg
+                if op == "$gte":
+                    return v >= arg
+                if op == "$lt":
+                    return v < arg
+                return v <= arg
+            except TypeError:
+                return False
+        return any(ok(v) for v in values if v is not None)
+    raise Unsupported(f"Query operator {op} is not supported by the bench store")
+
+def _match(doc, query):
+    for key, cond in (query or {}).items():
+        if key == "$text":
+            if not _text_score(doc, cond["$search"]):
+                return False
+            continue
+        if key == "$or":
+            if not any(_match(doc, sub) for sub in cond):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            if not all(_compare(value, op, arg) for op, arg in cond.items()):
+                return False
+        elif isinstance(value, list) and not isinstance(cond, list):
+            if cond not in value:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+def _in(key, values):
+    def check(doc):
+        value = doc.get(key)
+        try:
+            return value in values
+        except TypeError:
+            # An array field matches when any element does
+            return any(v in values for v in value)
+    return check
+
+def _matcher(query):
+    """_match as a predicate, top level $in filters checked against a set"""
+    checks = []
+    for key, cond in (query or {}).items():
+        if key.startswith("$") or "." in key or not (isinstance(cond, dict) and list(cond) == ["$in"]):
+            return lambda doc: _match(doc, query)
+        try:
+            checks.append(_in(key, set(cond["$in"])))
+        except TypeError:
+            # Unhashable values, like documents
+            return lambda doc: _match(doc, query)
+    if len(checks) == 1:
+        return checks[0]
+    return lambda doc: all(check(doc) for check in checks)
+
+def _apply(doc, update, inserting):
+    for op, fields in update.items():
+        for key, arg in fields.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                doc[key] = copy.deepcopy(arg)
+            elif op == "$setOnInsert":
+                continue
+            elif op == "$inc":
+                doc[key] = doc.get(key, 0) + arg
+            elif op == "$unset":
+                doc.pop(key, None)
+            elif op == "$push":
+                doc.setdefault(key, []).append(copy.deepcopy(arg))
+            elif op == "$addToSet":
+                if arg not in doc.setdefault(key, []):
+                    doc[key].append(copy.deepcopy(arg))
+            elif op == "$pull":
+                doc[key] = [v for v in doc.get(key, []) if v != arg]
+            else:
+                raise Unsupported(f"Update operator {op} is not supported by the bench store")
+
+def _project(doc, projection, score):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v == 1 or v is True}
+    metas = {k for k, v in projection.items() if isinstance(v, dict)}
+    if include:
+        out = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+    else:
+        out = {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+    for key in metas:
+        out[key] = score
+    return out
+
+class Cursor:
+    def __init__(self, col, query, projection):
+        self._col = col
+        self._query = query or {}
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        self._sort = list(key) if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _results(self):
+        search = (self._query.get("$text") or {}).get("$search")
+        if search:
+            # Only posts sharing a word can match, found through the word index
+            rows = self._col._text_search(
+                search, _matcher({k: v for k, v in self._query.items() if k != "$text"})
+            )
+        else:
+            rows = [(doc, None) for doc in self._col._docs.values() if _match(doc, self._query)]
+        for key, direction in reversed(self._sort):
+            if isinstance(direction, dict):
+                rows.sort(key=lambda row: row[1] or 0, reverse=True)
+            else:
+                rows.sort(key=lambda row: (_get(row[0], key) is None, _get(row[0], key)), reverse=direction == -1)
+        rows = rows[self._skip:]
+        if self._limit:
+            rows = rows[:self._limit]
+        return [_project(doc, self._projection, score) for doc, score in rows]
+
+    async def to_list(self, length=None):
+        results = self._results()
+        return results if length is None else results[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._results():
+            yield doc
+
+def _expr(doc, expr):
+    """Evaluate the aggregation expressions the repo's pipelines use"""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return _get(doc, expr[1:])
+    if isinstance(expr, dict) and len(expr) == 1 and next(iter(expr)).startswith("$"):
+        op, arg = next(iter(expr.items()))
+        if op == "$size":
+            value = _expr(doc, arg)
+            if not isinstance(value, list):
+                raise Unsupported("$size needs an array, like MongoDB")
+            return len(value)
+        if op == "$ifNull":
+            return next((value for value in (_expr(doc, a) for a in arg) if value is not None), None)
+        if op == "$sum":
+            values = [_expr(doc, a) for a in arg] if isinstance(arg, list) else [_expr(doc, arg)]
+            return sum(v for v in values if isinstance(v, (int, float)))
+        raise Unsupported(f"Expression operator {op} is not supported by the bench store")
+    if isinstance(expr, dict):
+        return {key: _expr(doc, value) for key, value in expr.items()}
+    return expr
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = _expr(doc, spec["_id"])
+        out = groups.setdefault(repr(key), {"_id": key})
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, arg), = accumulator.items()
+            if op != "$sum":
+                raise Unsupported(f"Accumulator {op} is not supported by the bench store")
+            value = _expr(doc, arg)
+            out[field] = out.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+    return list(groups.values())
+
+def _bucket_auto(docs, spec):
+    """Split docs sorted by groupBy into about equal buckets, equal values kept together"""
+    values = sorted(_expr(doc, spec["groupBy"]) for doc in docs)
+    size = -(-len(values) // spec["buckets"]) if values else 0
+    buckets, start = [], 0
+    while start < len(values):
+        end = min(start + size, len(values))
+        while end < len(values) and values[end] == values[end - 1]:
+            end += 1
+        # Like MongoDB, a bucket's max is the next one's min, the last one's its own
+        high = values[end] if end < len(values) else values[-1]
+        buckets.append({"_id": {"min": values[start], "max": high}, "count": end - start})
+        start = end
+    return buckets
+
+class _Ops:
+    """Collects bulk_write requests the way pymongo's own bulk builder does
+
+    Each UpdateOne, InsertOne, ... adds itself through these calls, so the
+    store never reads their private fields.
+    """
+
+    def __init__(self):
+        self.ops = []
+
+    def add_insert(self, document):
+        self.ops.append(("insert", document))
+
+    def add_update(self, selector, update, multi, upsert, **kwargs):
+        self.ops.append(("update", selector, update, bool(upsert), multi))
+
+    def add_replace(self, selector, replacement, upsert, **kwargs):
+        self.ops.append(("replace", selector, replacement, bool(upsert)))
+
+    def add_delete(self, selector, limit, **kwargs):
+        self.ops.append(("delete", selector, limit))
+
+class AggregateCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length=None):
+        return self._docs if length is None else self._docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield doc
+
+class MemoryCollection:
+    """The slice of AsyncIOMotorCollection this repo uses, kept in a dict
+
+    The text field is tokenized on every write into a word -> _ids index,
+    so $text queries cost about what the matching posts do, like the
+    real text index, instead of a scan of the collection.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._docs = {}
+        self._words = {}
+        self._tokens = {}
+
+    def _reindex(self, doc):
+        self._unindex(doc["_id"])
+        tokens = _words(doc.get("text"))
+        if tokens:
+            self._tokens[doc["_id"]] = tokens
+            for word in tokens:
+                self._words.setdefault(word, set()).add(doc["_id"])
+
+    def _unindex(self, key):
+        for word in self._tokens.pop(key, ()):
+            ids = self._words[word]
+            ids.discard(key)
+            if not ids:
+                del self._words[word]
+
+    def _remove(self, key):
+        self._unindex(key)
+        del self._docs[key]
+
+    def _text_search(self, search, accept):
+        """(doc, score) of documents sharing a word with search that accept(doc)"""
+        words = _words(search)
+        ids = set().union(*(self._words.get(word, ()) for word in words))
+        rows = []
+        for key in ids:
+            doc = self._docs[key]
+            if accept(doc):
+                rows.append((doc, len(words & self._tokens[key])))
+        return rows
+
+    def _insert(self, doc):
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key {doc['_id']} in {self.name}")
+        self._docs[doc["_id"]] = doc
+        self._reindex(doc)
+        return doc["_id"]
+
+    def _first(self, query):
+        if "_id" in (query or {}) and not isinstance(query["_id"], dict):
+            doc = self._docs.get(query["_id"])
+            return doc if doc is not None and _match(doc, query) else None
+        return next((doc for doc in self._docs.values() if _match(doc, query)), None)
+
+    def _upsert_doc(self, query, update):
+        doc = {k: copy.deepcopy(v) for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        _apply(doc, update, True)
+        return doc
+
+    def _update(self, query, update, upsert, many=False):
+        if many:
+            docs = [doc for doc in self._docs.values() if _match(doc, query)]
+        else:
+            doc = self._first(query)
+            docs = [doc] if doc is not None else []
+        if not docs:
+            if not upsert:
+                return Result()
+            inserted = self._insert(self._upsert_doc(query, update))
+            return Result(upserted_id=inserted, upserted_count=1)
+        for doc in docs:
+            _apply(doc, update, False)
+            self._reindex(doc)
+        return Result(matched_count=len(docs), modified_count=len(docs))
+
+    async def find_one(self, query=None, projection=None):
+        doc = self._first(query)
+        return None if doc is None else _project(doc, projection, None)
+
+    def find(self, query=None, projection=None):
+        return Cursor(self, query, projection)
+
+    async def insert_one(self, doc):
+        return Result(inserted_id=self._insert(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        ids, errors = [], []
+        for index, doc in enumerate(docs):
+            try:
+                ids.append(self._insert(doc))
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(ids)})
+        return Result(inserted_ids=ids)
+
+    async def update_one(self, query, update, upsert=False):
+        return self._update(query, update, upsert)
+
+    async def update_many(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=True)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        doc = self._first(query)
+        if doc is None:
+            if not upsert:
+                return None
+            inserted = self._insert(self._upsert_doc(query, update))
+            return _project(self._docs[inserted], projection, None) if return_document else None
+        before = _project(doc, projection, None)
+        _apply(doc, update, False)
+        self._reindex(doc)
+        return _project(doc, projection, None) if return_document else before
+
+    async def find_one_and_delete(self, query, projection=None):
+        doc = self._first(query)
+        if doc is None:
+            return None
+        self._remove(doc["_id"])
+        return _project(doc, projection, None)
+
+    async def delete_one(self, query):
+        doc = self._first(query)
+        if doc is None:
+            return Result()
+        self._remove(doc["_id"])
+        return Result(deleted_count=1)
+
+    async def delete_many(self, query):
+        ids = [key for key, doc in self._docs.items() if _match(doc, query)]
+        for key in ids:
+            self._remove(key)
+        return Result(deleted_count=len(ids))
+
+    def _replace(self, query, replacement, upsert):
+        doc = self._first(query)
+        if doc is None:
+            if not upsert:
+                return Result()
+            inserted = self._insert({**self._upsert_doc(query, {}), **replacement})
+            return Result(upserted_id=inserted, upserted_count=1)
+        doc = self._docs[doc["_id"]] = {**copy.deepcopy(replacement), "_id": doc["_id"]}
+        self._reindex(doc)
+        return Result(matched_count=1, modified_count=1)
+
+    def _delete(self, query, limit):
+        ids = [key for key, doc in self._docs.items() if _match(doc, query)]
+        for key in ids[:limit or None]:
+            self._remove(key)
+        return Result(deleted_count=len(ids[:limit or None]))
+
+    async def bulk_write(self, requests, ordered=True):
+        ops = _Ops()
+        for request in requests:
+            request._add_to_bulk(ops)
+        total = Result(inserted_count=0)
+        for kind, *args in ops.ops:
+            if kind == "insert":
+                self._insert(args[0])
+                total.inserted_count += 1
+                continue
+            if kind == "update":
+                query, update, upsert, multi = args
+                result = self._update(query, update, upsert, many=multi)
+            elif kind == "replace":
+                result = self._replace(*args)
+            else:
+                result = self._delete(*args)
+            total.matched_count += result.matched_count
+            total.modified_count += result.modified_count
+            total.upserted_count += result.upserted_count
+            total.deleted_count += result.deleted_count
+        return total
+
+    async def count_documents(self, query):
+        return sum(1 for doc in self._docs.values() if _match(doc, query))
+
+    async def estimated_document_count(self):
+        return len(self._docs)
+
+    async def create_indexes(self, indexes):
+        return [index.document["name"] for index in indexes]
+
+    def aggregate(self, pipeline, **kwargs):
+        docs = list(self._docs.values())
+        for stage in pipeline:
+            if "$match" in stage:
+                docs = [doc for doc in docs if _match(doc, stage["$match"])]
+            elif "$group" in stage:
+                docs = _group(docs, stage["$group"])
+            elif "$bucketAuto" in stage:
+                docs = _bucket_auto(docs, stage["$bucketAuto"])
+            elif "$sort" in stage:
+                for key, direction in reversed(list(stage["$sort"].items())):
+                    docs.sort(key=lambda doc: (_get(doc, key) is None, _get(doc, key)), reverse=direction == -1)
+            elif "$skip" in stage:
+                docs = docs[stage["$skip"]:]
+            elif "$limit" in stage:
+                docs = docs[:stage["$limit"]]
+            else:
+                raise Unsupported(f"Pipeline stage {list(stage)} is not supported by the bench store")
+        return AggregateCursor([copy.deepcopy(doc) for doc in docs])
+
+class MemoryDatabase:
+    def __init__(self, name):
+        self.name = name
+        self._cols = {}
+
+    def __getitem__(self, name):
+        if name not in self._cols:
+            self._cols[name] = MemoryCollection(name)
+        return self._cols[name]
+
+class MemoryClient:
+    """Drop-in for AsyncIOMotorClient, connection options are ignored"""
+
+    def __init__(self, *args, **kwargs):
+        self._dbs = {}
+
+    def __getitem__(self, name):
+        if name not in self._dbs:
+            self._dbs[name] = MemoryDatabase(name)
+        return self._dbs[name]
+
+def install():
+    """Make `from motor.motor_asyncio import AsyncIOMotorClient` return MemoryClient
+
+    Has to run before utils.db is imported.
+    """
+    if "utils.db" in sys.modules:
+        raise RuntimeError("bench.mongo.install() must run before the bot modules are imported")
+    motor = types.ModuleType("motor")
+    motor_asyncio = types.ModuleType("motor.motor_asyncio")
+    motor_asyncio.AsyncIOMotorClient = MemoryClient
+    motor.motor_asyncio = motor_asyncio
+    sys.modules["motor"] = motor
+    sys.modules["motor.motor_asyncio"] = motor_asyncio
@@ -0,0 +1,234 @@
+"""Replay a recorded update log against the plugin handlers
+
+    python -m bench.replay updates.jsonl.gz --speed 10
+
+The log comes from a bot running with RECORD_UPDATES set. Updates are
+fed through the same handler groups and filters pyrogram would use,
+by a pool of workers like pyrogram's, with Telegram replaced by
+bench.telegram.FakeClient and Mongo by the in-memory store. Groups
+seen in the log are seeded as verified groups whose channels hold a
+post for about --hit-rate of the recorded queries.
+"""
+import argparse
+import asyncio
+import gzip
+import importlib
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+from pathlib import Path
+from pyrogram import enums, handlers, types, StopPropagation, ContinuePropagation
+from bench import mongo
+from bench.telegram import FakeClient
+
+def load(path, limit=None):
+    """Recorded updates with times on one timeline
+
+    A log appended to by several bot runs restarts its clock each time,
+    later runs are shifted to follow the earlier ones.
+    """
+    records = []
+    offset = last = 0.0
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["t"] + offset < last:
+                offset = last
+            record["t"] += offset
+            last = record["t"]
+            records.append(record)
+            if limit and len(records) >= limit:
+                break
+    return records
+
+def load_handlers(root="plugins"):
+    """group -> handlers, registered in the order pyrogram would"""
+    groups = {}
+    for path in sorted(Path(root).rglob("*.py")):
+        module = importlib.import_module(".".join(path.with_suffix("").parts))
+        for name in vars(module).keys():
+            for handler, group in getattr(getattr(module, name), "handlers", []) or []:
+                groups.setdefault(group, []).append(handler)
+    return dict(sorted(groups.items()))
+
+async def seed(records, rng, hit_rate):
+    from utils.db import groups_col, users_col, posts_col
+    from utils.trigram import trigram_index
+
+    group_ids, users, queries = set(), set(), {}
+    for record in records:
+        if record.get("u"):
+            users.add(record["u"])
+        if record["k"] == "m" and record.get("ct") in ("group", "supergroup"):
+            group_ids.add(record["c"])
+            text = record.get("x")
+            if text and not text.startswith("/"):
+                queries.setdefault(record["c"], set()).add(text)
+
+    group_docs, post_docs = [], []
+    for index, group_id in enumerate(sorted(group_ids)):
+        channels = [-1003000000000 - index * 2, -1003000000000 - index * 2 - 1]
+        group_docs.append({
+            "_id": group_id, "name": f"Group {index}", "user_id": 0, "user_name": "owner",
+            "channels": channels, "f_sub": None, "verified": True
+        })
+        for message_id, text in enumerate(sorted(queries.get(group_id, ())), 1):
+            if rng.random() < hit_rate:
+                title = text[:100]
+                post_docs.append({
+                    "channel_id": rng.choice(channels), "message_id": message_id, "username": None,
+                    "text": text, "title": title
+                })
+    if group_docs:
+        await groups_col.insert_many(group_docs)
+    if post_docs:
+        await posts_col.insert_many(post_docs)
+    if users:
+        await users_col.insert_many([{"_id": user_id, "name": f"user{user_id}"} for user_id in users])
+    await trigram_index.load(posts_col)
+    return len(group_docs), len(post_docs), len(users)
+
+def build(bot, record):
+    chat = bot.chat(record["c"], type=enums.ChatType(record["ct"])) if "c" in record else None
+    user = bot.user(record["u"]) if record.get("u") else None
+    if record["k"] == "m":
+        members = [bot.user(user_id) for user_id in record["n"]] if record.get("n") else None
+        return bot.message(chat, record.get("x"), from_user=user, new_chat_members=members)
+    if record["k"] == "c":
+        return bot.callback_query(bot.message(chat, None, from_user=bot.me), user, record["d"])
+    status = enums.ChatMemberStatus
+    return bot.chat_member_updated(
+        chat, user,
+        status(record["o"]) if record.get("o") else None,
+        status(record["n"]) if record.get("n") else None
+    )
+
+async def dispatch(bot, groups, update, errors):
+    """Same rules as pyrogram's Dispatcher: first match per group, groups in order"""
+    for group_handlers in groups.values():
+        for handler in group_handlers:
+            if not isinstance(update, handler_update_type(handler)):
+                continue
+            try:
+                if await handler.check(bot, update):
+                    await handler.callback(bot, update)
+                    break
+            except StopPropagation:
+                return
+            except ContinuePropagation:
+                continue
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                logging.getLogger(__name__).debug(f"Handler error: {e}")
+                break
+
+def handler_update_type(handler):
+    if isinstance(handler, handlers.MessageHandler):
+        return types.Message
+    if isinstance(handler, handlers.CallbackQueryHandler):
+        return types.CallbackQuery
+    if isinstance(handler, handlers.ChatMemberUpdatedHandler):
+        return types.ChatMemberUpdated
+    return ()
+
+async def replay(bot, groups, records, speed, workers):
+    queue = asyncio.Queue()
+    lags, durations = [], []
+    errors = Counter()
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            due, update = item
+            start = time.perf_counter()
+            lags.append(start - due)
+            await dispatch(bot, groups, update, errors)
+            durations.append(time.perf_counter() - start)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    started = time.perf_counter()
+    for record in records:
+        due = started + record["t"] / speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        queue.put_nowait((due, build(bot, record)))
+    for _ in tasks:
+        queue.put_nowait(None)
+    await asyncio.gather(*tasks)
+    return lags, durations, errors, time.perf_counter() - started
+
+def _ms(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+async def main(args):
+    from utils.helpers import user_buffer
+    from utils.scheduler import delete_scheduler
+    from utils.metrics import profile
+    from utils.exporter import CACHES
+
+    records = load(args.log, args.limit)
+    if not records:
+        raise SystemExit("Empty log")
+    bot = FakeClient.from_args(args)
+    groups = load_handlers()
+
+    seeded = await seed(records, random.Random(args.seed), args.hit_rate)
+    print(f"Seeded {seeded[0]} groups, {seeded[1]} posts, {seeded[2]} users")
+    await delete_scheduler.start(bot)
+    user_buffer.start()
+    try:
+        lags, durations, errors, elapsed = await replay(bot, groups, records, args.speed, args.workers)
+    finally:
+        await user_buffer.stop()
+        await delete_scheduler.stop()
+
+    lags.sort()
+    durations.sort()
+    span = records[-1]["t"] - records[0]["t"]
+    print(
+        f"{len(records)} updates recorded over {span:.0f}s replayed in {elapsed:.1f}s "
+        f"at {args.speed:g}x with {args.workers} workers, {len(records) / elapsed:.1f}/s"
+    )
+    print(f"queue lag   p50 {_ms(lags, 0.5):8.1f}  p95 {_ms(lags, 0.95):8.1f}  p99 {_ms(lags, 0.99):8.1f}  max {_ms(lags, 1):8.1f} ms")
+    print(f"dispatch    p50 {_ms(durations, 0.5):8.1f}  p95 {_ms(durations, 0.95):8.1f}  p99 {_ms(durations, 0.99):8.1f}  max {_ms(durations, 1):8.1f} ms")
+    print("api calls   " + ", ".join(f"{method}={count}" for method, count in sorted(bot.calls.items())))
+    if bot.floodwaits:
+        print("floodwaits  " + ", ".join(f"{method}={count}" for method, count in sorted(bot.floodwaits.items())))
+    if errors:
+        print("errors      " + ", ".join(f"{name}={count}" for name, count in errors.most_common()))
+    print()
+    print(f"{'handler':<20}{'calls':>7}{'err':>5}{'p50':>8}{'p95':>8}{'p99':>8}{'io':>8}")
+    for name, row in sorted(profile.table().items(), key=lambda item: -item[1]["calls"]):
+        print(
+            f"{name:<20}{row['calls']:>7}{row['errors']:>5}{row['p50'] * 1000:>8.1f}"
+            f"{row['p95'] * 1000:>8.1f}{row['p99'] * 1000:>8.1f}{row['awaited'] * 1000:>8.1f}"
+        )
+    print()
+    print(f"{'cache':<20}{'entries':>9}{'hit ratio':>11}")
+    for name, cache in CACHES.items():
+        stats = cache.stats()
+        print(f"{name:<20}{stats['size']:>9}{stats['hit_ratio']:>11.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m bench.replay", description="Replay recorded updates")
+    parser.add_argument("log", help="a RECORD_UPDATES .jsonl.gz file")
+    parser.add_argument("--speed", type=float, default=1.0, help="1, 10, 100... times the recorded pace")
+    parser.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 0) + 4), help="like Client(workers=)")
+    parser.add_argument("--hit-rate", type=float, default=0.7, help="share of recorded queries with a matching post")
+    parser.add_argument("--limit", type=int, help="replay only the first updates")
+    FakeClient.add_arguments(parser)
+    args = parser.parse_args()
+
+    # Never record the replay itself
+    os.environ["RECORD_UPDATES"] = ""
+    logging.basicConfig(level=logging.ERROR)
+    mongo.install()
+    asyncio.run(main(args))
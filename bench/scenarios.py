@@ -0,0 +1,164 @@
+import asyncio
+import random
+import time
+from info import ADMIN
+from utils.db import groups_col, users_col, posts_col
+from utils.helpers import user_buffer
+from utils.scheduler import delete_scheduler
+from utils.trigram import trigram_index
+from plugins.database import database
+from plugins.search import search_handler, search_limiter
+from plugins.fsub import force_sub
+from plugins.broadcast import broadcast_users
+from plugins.connect import connect_channel
+
+WORDS = (
+    "avengers batman inception joker matrix titanic gladiator interstellar dune alien "
+    "frozen coco up cars shrek rocky jaws psycho vertigo memento heat fargo seven "
+    "spectre skyfall tenet oppenheimer barbie wonka elemental encanto moana"
+).split()
+TAGS = ("2019", "2021", "2023", "720p", "1080p", "hindi", "english", "dubbed", "hdrip", "web-dl")
+
+GROUP_BASE = -1001000000000
+CHANNEL_BASE = -1002000000000
+USER_BASE = 5000000
+
+def _group_id(index):
+    return GROUP_BASE - index
+
+def _channel_id(index):
+    return CHANNEL_BASE - index
+
+def _title(rng):
+    return " ".join([rng.choice(WORDS), rng.choice(WORDS), rng.choice(TAGS), rng.choice(TAGS)])
+
+async def seed(rng, groups=50, channels_per_group=3, posts_per_channel=200, users=2000, f_sub=False):
+    """Fill the in-memory store with groups, their channels' posts and users"""
+    group_docs, post_docs = [], []
+    for g in range(groups):
+        channels = [_channel_id(g * channels_per_group + c) for c in range(channels_per_group)]
+        group_docs.append({
+            "_id": _group_id(g),
+            "name": f"Group {g}",
+            "user_id": USER_BASE + g,
+            "user_name": f"owner{g}",
+            "channels": channels,
+            "f_sub": _channel_id(10 ** 6 + g) if f_sub else None,
+            "verified": True
+        })
+        for channel_id in channels:
+            for message_id in range(1, posts_per_channel + 1):
+                title = _title(rng)
+                post_docs.append({
+                    "channel_id": channel_id,
+                    "message_id": message_id,
+                    "username": None,
+                    "text": title,
+                    "title": title
+                })
+    if group_docs:
+        await groups_col.insert_many(group_docs)
+    if post_docs:
+        await posts_col.insert_many(post_docs)
+    if users:
+        await users_col.insert_many([{"_id": USER_BASE + u, "name": f"user{u}"} for u in range(users)])
+    await trigram_index.load(posts_col)
+
+def _query(rng):
+    """Mostly titles that exist, some misspelt, some unknown"""
+    roll = rng.random()
+    if roll < 0.7:
+        return f"{rng.choice(WORDS)} {rng.choice(TAGS)}"
+    if roll < 0.9:
+        word = rng.choice(WORDS)
+        return word[:-1] + rng.choice("aeiou") if len(word) > 3 else word
+    return f"nothing{rng.randrange(10 ** 6)}"
+
+async def drive(count, concurrency, make_call):
+    """Run count calls of make_call(i) with at most concurrency in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await make_call(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return latencies, time.perf_counter() - start
+
+def _group_message(bot, rng, groups, users, text):
+    group = rng.randrange(groups)
+    user = bot.user(USER_BASE + rng.randrange(users))
+    return bot.message(bot.chat(_group_id(group), title=f"Group {group}"), text, from_user=user)
+
+async def search(bot, rng, ops, concurrency):
+    await seed(rng)
+
+    async def call(i):
+        await search_handler(bot, _group_message(bot, rng, 50, 2000, _query(rng)))
+
+    latencies, elapsed = await drive(ops, concurrency, call)
+    extra = {"throttled": search_limiter.throttled_users + search_limiter.throttled_groups}
+    return latencies, elapsed, extra
+
+async def fsub(bot, rng, ops, concurrency):
+    await seed(rng, posts_per_channel=0, f_sub=True)
+
+    async def call(i):
+        await force_sub(bot, _group_message(bot, rng, 50, 2000, _query(rng)))
+
+    latencies, elapsed = await drive(ops, concurrency, call)
+    return latencies, elapsed, {}
+
+async def broadcast(bot, rng, ops, concurrency):
+    """One /broadcast to ops users; latency is per copy_message"""
+    import utils.broadcast
+
+    await seed(rng, groups=0, users=ops)
+    admin = bot.user(ADMIN)
+    chat = bot.chat(ADMIN)
+    original = bot.message(chat, "Release day!", from_user=admin)
+    command = bot.message(chat, "/broadcast", from_user=admin, reply_to_message=original)
+
+    start = time.perf_counter()
+    await broadcast_users(bot, command)
+    while utils.broadcast._running:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    job = await utils.broadcast.broadcasts_col.find_one({})
+    extra = {"delivered": job["success"], "failed": job["failed"]}
+    return list(bot.timings["copy_message"]), elapsed, extra
+
+async def connect(bot, rng, ops, concurrency):
+    """Group owners connecting new channels, ops spread over 50 groups"""
+    await seed(rng, posts_per_channel=0)
+
+    async def call(i):
+        group = i % 50
+        chat = bot.chat(_group_id(group), title=f"Group {group}")
+        text = f"/connect {_channel_id(10 ** 7 + i)}"
+        await connect_channel(bot, bot.message(chat, text, from_user=bot.user(USER_BASE + group)))
+
+    latencies, elapsed = await drive(ops, concurrency, call)
+    group = await database.groups_col.find_one({"_id": _group_id(0)})
+    return latencies, elapsed, {"channels_on_group_0": len(group["channels"])}
+
+SCENARIOS = {
+    "search": search,
+    "fsub": fsub,
+    "broadcast": broadcast,
+    "connect": connect
+}
+
+async def run(name, bot, ops, concurrency, seed_value):
+    rng = random.Random(seed_value)
+    await delete_scheduler.start(bot)
+    user_buffer.start()
+    try:
+        return await SCENARIOS[name](bot, rng, ops, concurrency)
+    finally:
+        await user_buffer.stop()
+        await delete_scheduler.stop()
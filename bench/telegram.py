@@ -0,0 +1,152 @@
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pyrogram import enums, types
+from pyrogram.errors import FloodWait, UserNotParticipant
+
+class FakeClient:
+    """In-process stand-in for the bot Client
+
+    Every API call sleeps for latency * (1 +- jitter) seconds and fails
+    with FloodWait at floodwait_rate. Calls, FloodWaits and latencies are
+    counted per method. get_chat_member reports about `members` of all
+    users as joined.
+
+    Updates are real pyrogram types bound to this client, so bound
+    methods like message.reply() and the handler filters work as usual.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.5, floodwait_rate=0.0, floodwait_seconds=1,
+                 members=0.8, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.floodwait_rate = floodwait_rate
+        self.floodwait_seconds = floodwait_seconds
+        self.members = members
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.floodwaits = Counter()
+        self.timings = defaultdict(list)
+        # What pyrogram filters and bound methods expect on a Client
+        self.parse_mode = enums.ParseMode.DEFAULT
+        self.executor = ThreadPoolExecutor(4, thread_name_prefix="Handler")
+        self.me = self.user(1, "RMC Bench Bot", "rmc_bench_bot")
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument("--latency", type=float, default=0.05, help="mean Telegram API latency in seconds")
+        parser.add_argument("--jitter", type=float, default=0.5, help="latency varies by +- this fraction")
+        parser.add_argument("--floodwait-rate", type=float, default=0.0, help="share of API calls failing with FloodWait")
+        parser.add_argument("--floodwait-seconds", type=int, default=1)
+        parser.add_argument("--members", type=float, default=0.8, help="share of users in the force sub channel")
+        parser.add_argument("--seed", type=int, default=1)
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(
+            latency=args.latency, jitter=args.jitter, floodwait_rate=args.floodwait_rate,
+            floodwait_seconds=args.floodwait_seconds, members=args.members, seed=args.seed
+        )
+
+    @property
+    def loop(self):
+        return asyncio.get_running_loop()
+
+    async def _call(self, method):
+        self.calls[method] += 1
+        start = time.perf_counter()
+        delay = self.latency * (1 + self.random.uniform(-self.jitter, self.jitter))
+        await asyncio.sleep(max(delay, 0))
+        self.timings[method].append(time.perf_counter() - start)
+        if self.random.random() < self.floodwait_rate:
+            self.floodwaits[method] += 1
+            raise FloodWait(value=self.floodwait_seconds)
+
+    # Update builders, no API call involved
+
+    def chat(self, chat_id, title=None, type=None):
+        if type is None:
+            type = enums.ChatType.SUPERGROUP if chat_id < 0 else enums.ChatType.PRIVATE
+        return types.Chat(
+            client=self, id=chat_id, type=type, title=title or (f"Chat {chat_id}" if chat_id < 0 else None),
+            invite_link=f"https://t.me/+bench{abs(chat_id)}", members_count=1000
+        )
+
+    def user(self, user_id, first_name=None, username=None):
+        return types.User(client=self, id=user_id, first_name=first_name or f"user{user_id}", username=username)
+
+    def message(self, chat, text=None, from_user=None, reply_to_message=None, new_chat_members=None):
+        message = types.Message(
+            client=self, id=next(self._ids), chat=chat, text=text, from_user=from_user,
+            reply_to_message=reply_to_message, new_chat_members=new_chat_members
+        )
+        # Normally set by filters.command, handlers called directly need it too
+        if text and text.startswith("/"):
+            message.command = text[1:].split()
+        return message
+
+    def callback_query(self, message, from_user, data):
+        return types.CallbackQuery(
+            client=self, id=str(next(self._ids)), from_user=from_user,
+            chat_instance="0", message=message, data=data
+        )
+
+    def chat_member_updated(self, chat, user, old_status=None, new_status=None):
+        def member(status):
+            return types.ChatMember(client=self, status=status, user=user) if status else None
+        return types.ChatMemberUpdated(
+            client=self, chat=chat, from_user=user, date=None,
+            old_chat_member=member(old_status), new_chat_member=member(new_status)
+        )
+
+    # Bot API methods the plugins call
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call("send_message")
+        return self.message(self.chat(chat_id), text, self.me)
+
+    async def copy_message(self, chat_id, from_chat_id, message_id, **kwargs):
+        await self._call("copy_message")
+        return self.message(self.chat(chat_id), None, self.me)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await self._call("edit_message_text")
+        return types.Message(client=self, id=message_id, chat=self.chat(chat_id), text=text, from_user=self.me)
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        await self._call("delete_messages")
+        return len(message_ids) if isinstance(message_ids, list) else 1
+
+    async def answer_callback_query(self, callback_query_id, text=None, show_alert=None, **kwargs):
+        await self._call("answer_callback_query")
+        return True
+
+    async def get_me(self):
+        await self._call("get_me")
+        return self.me
+
+    async def get_chat(self, chat_id):
+        await self._call("get_chat")
+        return self.chat(chat_id, type=enums.ChatType.CHANNEL if chat_id < 0 else None)
+
+    async def get_chat_member(self, chat_id, user_id):
+        await self._call("get_chat_member")
+        # Stable per user, so cached answers stay right
+        if (user_id * 2654435761) % 1000 >= self.members * 1000:
+            raise UserNotParticipant()
+        return types.ChatMember(client=self, status=enums.ChatMemberStatus.MEMBER, user=self.user(user_id))
+
+    async def leave_chat(self, chat_id, **kwargs):
+        await self._call("leave_chat")
+        return True
+
+    async def create_chat_invite_link(self, chat_id, **kwargs):
+        await self._call("create_chat_invite_link")
+        return types.ChatInviteLink(
+            invite_link=f"https://t.me/+bench{abs(chat_id)}", date=None,
+            is_primary=False, is_revoked=False
+        )
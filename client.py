@@ -1,10 +1,21 @@
-from pyrogram import Client
 from info import API_ID, API_HASH, BOT_TOKEN
+from utils.metrics import MeteredClient
 
-bot = Client(
+bot = MeteredClient(
     "RMCBot",
     api_id=API_ID,
     api_hash=API_HASH,
     bot_token=BOT_TOKEN,
     plugins=dict(root="plugins")
 )
+
+def worker_client(index):
+    """Bot session of one worker process, it sends but never receives updates"""
+    return MeteredClient(
+        f"RMCBot-worker{index}",
+        api_id=API_ID,
+        api_hash=API_HASH,
+        bot_token=BOT_TOKEN,
+        plugins=dict(root="plugins"),
+        no_updates=True
+    )
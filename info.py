@@ -5,6 +5,109 @@ API_ID = int(environ.get("API_ID", "29034951"))
 API_HASH = environ.get("API_HASH", "cfc8448de6746a6ccf9dc1812cf1c8f7")
 BOT_TOKEN = environ.get("BOT_TOKEN", "")
 DATABASE_URI = environ.get("DATABASE_URI", "")
+DATABASE_NAME = environ.get("DATABASE_NAME", "ChannelFilter")
 LOG_CHANNEL = int(environ.get("LOG_CHANNEL", "-1002423393168"))
 ADMIN = int(environ.get("ADMIN", "1328531459"))
 CHANNEL = environ.get("CHANNEL", "@RMCBACKUP")
+
+# User session
+USER_SESSION_CHECK_INTERVAL = int(environ.get("USER_SESSION_CHECK_INTERVAL", "300"))
+
+# Database
+DB_MAX_POOL_SIZE = int(environ.get("DB_MAX_POOL_SIZE", "50"))
+DB_MIN_POOL_SIZE = int(environ.get("DB_MIN_POOL_SIZE", "5"))
+DB_CONNECT_TIMEOUT_MS = int(environ.get("DB_CONNECT_TIMEOUT_MS", "10000"))
+DB_SOCKET_TIMEOUT_MS = int(environ.get("DB_SOCKET_TIMEOUT_MS", "20000"))
+DB_SERVER_SELECTION_TIMEOUT_MS = int(environ.get("DB_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+DB_READ_PREFERENCE = environ.get("DB_READ_PREFERENCE", "primaryPreferred")
+DB_WRITE_CONCERN = environ.get("DB_WRITE_CONCERN", "1")
+STREAM_BATCH_SIZE = int(environ.get("STREAM_BATCH_SIZE", "500"))
+USER_FLUSH_INTERVAL = float(environ.get("USER_FLUSH_INTERVAL", "5"))
+USER_FLUSH_MAX = int(environ.get("USER_FLUSH_MAX", "1000"))
+STATS_RECONCILE_INTERVAL = int(environ.get("STATS_RECONCILE_INTERVAL", "1800"))
+
+# Caches
+GROUP_CACHE_SIZE = int(environ.get("GROUP_CACHE_SIZE", "5000"))
+GROUP_CACHE_TTL = int(environ.get("GROUP_CACHE_TTL", "600"))
+FSUB_CACHE_SIZE = int(environ.get("FSUB_CACHE_SIZE", "50000"))
+FSUB_POSITIVE_TTL = int(environ.get("FSUB_POSITIVE_TTL", "3600"))
+FSUB_NEGATIVE_TTL = int(environ.get("FSUB_NEGATIVE_TTL", "30"))
+CHAT_CACHE_SIZE = int(environ.get("CHAT_CACHE_SIZE", "5000"))
+CHAT_CACHE_TTL = int(environ.get("CHAT_CACHE_TTL", "1800"))
+CHAT_CACHE_STALE_TTL = int(environ.get("CHAT_CACHE_STALE_TTL", "86400"))
+CHAT_RESOLVE_CONCURRENCY = int(environ.get("CHAT_RESOLVE_CONCURRENCY", "10"))
+
+# Search
+SEARCH_CONCURRENCY = int(environ.get("SEARCH_CONCURRENCY", "8"))
+SEARCH_CHANNEL_TIMEOUT = float(environ.get("SEARCH_CHANNEL_TIMEOUT", "5"))
+SEARCH_RESULTS_LIMIT = int(environ.get("SEARCH_RESULTS_LIMIT", "20"))
+RESULT_CACHE_SIZE = int(environ.get("RESULT_CACHE_SIZE", "5000"))
+RESULT_CACHE_BYTES = int(environ.get("RESULT_CACHE_BYTES", str(32 * 1024 * 1024)))
+RESULT_CACHE_TTL = int(environ.get("RESULT_CACHE_TTL", "900"))
+# No results can be a live search timeout, kept briefly so a retry can find them
+RESULT_CACHE_EMPTY_TTL = int(environ.get("RESULT_CACHE_EMPTY_TTL", "60"))
+
+# Search rate limits, at most LIMIT searches in WINDOW seconds
+SEARCH_USER_LIMIT = int(environ.get("SEARCH_USER_LIMIT", "5"))
+SEARCH_USER_WINDOW = int(environ.get("SEARCH_USER_WINDOW", "30"))
+SEARCH_GROUP_LIMIT = int(environ.get("SEARCH_GROUP_LIMIT", "60"))
+SEARCH_GROUP_WINDOW = int(environ.get("SEARCH_GROUP_WINDOW", "60"))
+
+# Fuzzy title search, postings counted and candidates scored per lookup
+# bound the time one lookup holds the event loop
+FUZZY_THRESHOLD = float(environ.get("FUZZY_THRESHOLD", "0.35"))
+FUZZY_MAX_POSTINGS = int(environ.get("FUZZY_MAX_POSTINGS", "50000"))
+FUZZY_MAX_CANDIDATES = int(environ.get("FUZZY_MAX_CANDIDATES", "500"))
+
+# Search result pages, kept per query for the prev/next buttons
+SEARCH_PAGE_SIZE = int(environ.get("SEARCH_PAGE_SIZE", "10"))
+SEARCH_PAGE_CACHE_TTL = int(environ.get("SEARCH_PAGE_CACHE_TTL", "120"))
+SEARCH_SESSION_TTL = int(environ.get("SEARCH_SESSION_TTL", "600"))
+
+# Broadcast
+BROADCAST_CONCURRENCY = int(environ.get("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_RATE = float(environ.get("BROADCAST_RATE", "25"))
+BROADCAST_BATCH_SIZE = int(environ.get("BROADCAST_BATCH_SIZE", "200"))
+BROADCAST_PROGRESS_INTERVAL = int(environ.get("BROADCAST_PROGRESS_INTERVAL", "15"))
+
+# History backfill of newly connected channels, the rate is GetHistory
+# requests per second shared by every job, each returns up to 100 posts
+BACKFILL_RATE = float(environ.get("BACKFILL_RATE", "1"))
+BACKFILL_CONCURRENCY = int(environ.get("BACKFILL_CONCURRENCY", "2"))
+BACKFILL_POLL_INTERVAL = int(environ.get("BACKFILL_POLL_INTERVAL", "30"))
+# Failed batches in a row before a job is given up, FloodWaits do not count
+BACKFILL_MAX_ATTEMPTS = int(environ.get("BACKFILL_MAX_ATTEMPTS", "5"))
+
+# Auto delete
+DELETE_FLUSH_INTERVAL = float(environ.get("DELETE_FLUSH_INTERVAL", "2"))
+
+# Message prefilter
+PREFILTER_MIN_LENGTH = int(environ.get("PREFILTER_MIN_LENGTH", "2"))
+PREFILTER_MAX_LENGTH = int(environ.get("PREFILTER_MAX_LENGTH", "100"))
+PREFILTER_MAX_WORDS = int(environ.get("PREFILTER_MAX_WORDS", "10"))
+# Greetings and chatter that are never a title, words like "welcome",
+# "night" or "here" are left out as they are
+PREFILTER_STOPWORDS = environ.get(
+    "PREFILTER_STOPWORDS",
+    "hi,hii,hey,helo,hlo,bro,bhai,sir,ok,okay,k,thanks,thank,thx,ty,u,"
+    "gm,gn,yeah,yep,lol,hmm,haha,pls,plz"
+).split(",")
+
+# Metrics, written by the bot and served by app.py
+METRICS_FILE = environ.get("METRICS_FILE", "/tmp/rmc_metrics.prom")
+METRICS_INTERVAL = int(environ.get("METRICS_INTERVAL", "15"))
+PERF_WINDOW = int(environ.get("PERF_WINDOW", "500"))
+PERF_RECENT = int(environ.get("PERF_RECENT", "200"))
+
+# Workers, 0 runs everything in this process, N > 0 starts one receiver
+# and N worker processes that each handle the chats hashed to them
+WORKERS = int(environ.get("WORKERS", "0"))
+WORKER_LANES = int(environ.get("WORKER_LANES", "8"))
+HEARTBEAT_INTERVAL = int(environ.get("HEARTBEAT_INTERVAL", "10"))
+WORKER_STALE_AFTER = int(environ.get("WORKER_STALE_AFTER", "60"))
+
+# Update recording for bench/replay.py, a .jsonl.gz path enables it
+RECORD_UPDATES = environ.get("RECORD_UPDATES", "")
+# Keys the id hashing, logs recorded with the same secret share ids.
+# Falls back to BOT_TOKEN, which is secret but changes with the bot
+RECORD_SECRET = environ.get("RECORD_SECRET", "")
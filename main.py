@@ -1,7 +1,20 @@
 import asyncio
 import logging
-from client import bot
-from utils.helpers import create_indexes
+import time
+from pyrogram import idle
+from client import bot, worker_client
+from utils.helpers import create_indexes, preload_groups, user_buffer
+from utils.userbot import userbot
+from plugins.database import database
+from utils.broadcast import resume_broadcasts
+from utils.backfill import backfiller
+from utils.scheduler import delete_scheduler
+from utils.trigram import trigram_index
+from utils.counters import counters
+from utils.exporter import export_metrics
+from utils.recorder import recorder
+from utils.cluster import cluster, Receiver, Worker
+from info import STATS_RECONCILE_INTERVAL, WORKERS
 
 logging.basicConfig(
     level=logging.INFO,
@@ -10,18 +23,103 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def main():
-    await create_indexes()
-    logger.info("Database initialized")
-    
+# Tasks nothing awaits, kept referenced until they finish
+_background = set()
+
+def background(coro):
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+async def timed(name, aw):
+    start = time.perf_counter()
+    result = await aw
+    logger.info(f"Startup: {name} took {time.perf_counter() - start:.2f}s")
+    return result
+
+async def prepare(*jobs):
+    """Startup work that needs no bot connection, all at once"""
+    # Built in the background, fuzzy search finds nothing until it is done
+    background(timed("trigram index", trigram_index.load(database.col)))
+    jobs = list(jobs) + [timed("group cache", preload_groups(owns=cluster.owns))]
+    if cluster.primary:
+        # One user session across all workers
+        jobs.append(timed("user session", userbot.start()))
+    await timed("prepare", asyncio.gather(*jobs))
+
+async def start_services(client):
+    """Background jobs of a process that handles updates"""
+    if cluster.primary:
+        await resume_broadcasts(client)
+        # Also resumes jobs interrupted by a restart
+        backfiller.start(client)
+    await delete_scheduler.start(client, owns=cluster.owns)
+    user_buffer.start()
+    counters.start(STATS_RECONCILE_INTERVAL)
+    background(export_metrics())
+
+async def stop_services():
+    await user_buffer.stop()
+    await delete_scheduler.stop()
+    await backfiller.stop()
+    await userbot.stop()
+    if recorder:
+        await recorder.close()
+
+async def run_worker(index, workers, inbox, events):
+    cluster.join(index, workers, events)
+    if recorder:
+        recorder.for_worker(index)
+    client = worker_client(index)
+    await prepare()
+    await timed("bot login", client.start())
+    await timed("services", start_services(client))
+    logger.info(f"Worker {index}/{workers} started")
+    try:
+        await Worker(client, inbox).run()
+    finally:
+        await stop_services()
+        await client.stop()
+
+def worker_process(index, workers, inbox, events):
+    """Entry point of a worker process"""
+    try:
+        asyncio.run(run_worker(index, workers, inbox, events))
+    except KeyboardInterrupt:
+        pass
+
+async def run_receiver():
+    receiver = Receiver(bot, WORKERS, worker_process)
+    receiver.attach()
+    receiver.start()
     await bot.start()
-    logger.info("Bot started successfully")
-    
-    me = await bot.get_me()
-    logger.info(f"Bot ID: {me.id} | Username: @{me.username}")
-    
-    # Keep running
-    await asyncio.Event().wait()
+    logger.info(f"Receiver started with {WORKERS} workers")
+    try:
+        await idle()
+    finally:
+        await bot.stop()
+        await receiver.stop()
+
+async def main():
+    started = time.perf_counter()
+    if WORKERS:
+        await timed("indexes", create_indexes())
+        return await run_receiver()
+
+    await prepare(timed("indexes", create_indexes()))
+    # Updates are handled from here on, with caches and session ready
+    await timed("bot login", bot.start())
+    logger.info(f"Bot ID: {bot.me.id} | Username: @{bot.me.username}")
+    await timed("services", start_services(bot))
+    logger.info(f"Bot started in {time.perf_counter() - started:.2f}s")
+
+    # Keep running until SIGINT/SIGTERM
+    try:
+        await idle()
+    finally:
+        await stop_services()
+        await bot.stop()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,61 @@
+import logging
+from pyrogram import Client, filters
+from utils.helpers import is_channel_connected
+from utils.search import post_data, result_cache
+from utils.trigram import trigram_index
+from utils.metrics import track
+from utils.cluster import cluster
+from plugins.database import database
+
+logger = logging.getLogger(__name__)
+
+@cluster.on("post")
+def post_indexed(post):
+    trigram_index.add(post)
+    result_cache.invalidate_channel(post["channel_id"])
+
+@cluster.on("unpost")
+def posts_unindexed(channel_id, message_ids):
+    for message_id in message_ids:
+        trigram_index.remove(channel_id, message_id)
+    result_cache.invalidate_channel(channel_id)
+
+async def _index_post(message):
+    """Store a post from a connected channel, replacing an older copy"""
+    try:
+        data = post_data(message)
+        if not data or not await is_channel_connected(message.chat.id):
+            return
+        await database.insert_post(data)
+        post_indexed(data)
+        cluster.publish("post", data)
+    except Exception as e:
+        logger.error(f"Index post error: {e}")
+
+@Client.on_message(filters.channel & (filters.text | filters.caption))
+@track("channel_post")
+async def index_post(bot, message):
+    """Index new posts from connected channels"""
+    await _index_post(message)
+
+@Client.on_edited_message(filters.channel & (filters.text | filters.caption))
+@track("channel_edit")
+async def reindex_post(bot, message):
+    """Keep edited posts in sync with the index"""
+    await _index_post(message)
+
+@Client.on_deleted_messages(filters.channel)
+@track("channel_delete")
+async def unindex_posts(bot, messages):
+    """Drop deleted posts from the index"""
+    try:
+        by_channel = {}
+        for message in messages:
+            if message.chat:
+                by_channel.setdefault(message.chat.id, []).append(message.id)
+        for channel_id, message_ids in by_channel.items():
+            await database.delete_posts(channel_id, message_ids)
+            posts_unindexed(channel_id, message_ids)
+            cluster.publish("unpost", channel_id, message_ids)
+    except Exception as e:
+        logger.error(f"Unindex posts error: {e}")
@@ -1,12 +1,16 @@
 import logging
 from pyrogram import Client, filters
 from utils.helpers import get_group, update_group
+from utils.backfill import queue_backfill, channel_disconnected
+from utils.chats import get_chat_info, get_chats_info, forget_chat, leave_chat
 from utils.script import script
+from utils.metrics import track
 from info import LOG_CHANNEL
 
 logger = logging.getLogger(__name__)
 
 @Client.on_message(filters.group & filters.command("connect"))
+@track("connect")
 async def connect_channel(bot, message):
     try:
         if len(message.command) < 2:
@@ -14,7 +18,7 @@ async def connect_channel(bot, message):
         
         group = await get_group(message.chat.id)
         if not group:
-            return await bot.leave_chat(message.chat.id)
+            return await leave_chat(bot, message.chat.id)
         
         if message.from_user.id != group["user_id"]:
             return await message.reply(f"⚠️ Only {group['user_name']} can do this")
@@ -30,14 +34,20 @@ async def connect_channel(bot, message):
         
         channels.append(channel_id)
         await update_group(message.chat.id, {"channels": channels})
+        backfill = await queue_backfill(channel_id, message.chat.id)
         
         try:
-            channel = await bot.get_chat(channel_id)
+            channel = await get_chat_info(bot, channel_id)
             channel_link = f"[{channel.title}]({channel.invite_link})"
         except:
             channel_link = f"`{channel_id}`"
         
-        await message.reply(f"✅ Connected to channel {channel_link}")
+        if backfill == "completed":
+            await message.reply(f"✅ Connected to channel {channel_link}\n📥 Its older posts are already indexed")
+        elif backfill:
+            await message.reply(f"✅ Connected to channel {channel_link}\n📥 Its older posts are being indexed in the background")
+        else:
+            await message.reply(f"✅ Connected to channel {channel_link}\n📥 Only new posts will be indexed, older ones need the user session from /login")
         
         log_text = f"#NEW_CONNECTION\n\n👤 User: {message.from_user.mention}\n👥 Group: {message.chat.title}\n📢 Channel: {channel_link}"
         await bot.send_message(LOG_CHANNEL, log_text)
@@ -47,6 +57,7 @@ async def connect_channel(bot, message):
         await message.reply("⚠️ An error occurred!")
 
 @Client.on_message(filters.group & filters.command("disconnect"))
+@track("disconnect")
 async def disconnect_channel(bot, message):
     try:
         if len(message.command) < 2:
@@ -54,7 +65,7 @@ async def disconnect_channel(bot, message):
         
         group = await get_group(message.chat.id)
         if not group:
-            return await bot.leave_chat(message.chat.id)
+            return await leave_chat(bot, message.chat.id)
         
         if message.from_user.id != group["user_id"]:
             return await message.reply(f"⚠️ Only {group['user_name']} can do this")
@@ -70,14 +81,16 @@ async def disconnect_channel(bot, message):
         
         channels.remove(channel_id)
         await update_group(message.chat.id, {"channels": channels})
+        await channel_disconnected(channel_id)
         
         try:
-            channel = await bot.get_chat(channel_id)
+            channel = await get_chat_info(bot, channel_id)
             channel_link = f"[{channel.title}]({channel.invite_link})"
         except:
             channel_link = f"`{channel_id}`"
         
         await message.reply(f"✅ Disconnected from channel {channel_link}")
+        forget_chat(channel_id)
         log_text = f"#DISCONNECTION\n\n👤 User: {message.from_user.mention}\n👥 Group: {message.chat.title}\n📢 Channel: {channel_link}"
         await bot.send_message(LOG_CHANNEL, log_text)
         
@@ -86,6 +99,7 @@ async def disconnect_channel(bot, message):
         await message.reply("⚠️ An error occurred!")
 
 @Client.on_message(filters.group & filters.command("fsub"))
+@track("fsub")
 async def set_fsub(bot, message):
     try:
         if len(message.command) < 2:
@@ -93,7 +107,7 @@ async def set_fsub(bot, message):
         
         group = await get_group(message.chat.id)
         if not group:
-            return await bot.leave_chat(message.chat.id)
+            return await leave_chat(bot, message.chat.id)
         
         if message.from_user.id != group["user_id"]:
             return await message.reply(f"⚠️ Only {group['user_name']} can do this")
@@ -106,7 +120,7 @@ async def set_fsub(bot, message):
         await update_group(message.chat.id, {"f_sub": channel_id})
         
         try:
-            channel = await bot.get_chat(channel_id)
+            channel = await get_chat_info(bot, channel_id)
             channel_link = f"[{channel.title}]({channel.invite_link})"
         except:
             channel_link = f"`{channel_id}`"
@@ -120,11 +134,12 @@ async def set_fsub(bot, message):
         await message.reply("⚠️ An error occurred!")
 
 @Client.on_message(filters.group & filters.command("nofsub"))
+@track("nofsub")
 async def remove_fsub(bot, message):
     try:
         group = await get_group(message.chat.id)
         if not group:
-            return await bot.leave_chat(message.chat.id)
+            return await leave_chat(bot, message.chat.id)
         
         if message.from_user.id != group["user_id"]:
             return await message.reply(f"⚠️ Only {group['user_name']} can do this")
@@ -141,7 +156,32 @@ async def remove_fsub(bot, message):
         logger.error(f"Remove FSub error: {e}")
         await message.reply("⚠️ An error occurred!")
 
+@Client.on_message(filters.group & filters.command("stopwords"))
+@track("stopwords")
+async def set_stopwords(bot, message):
+    try:
+        group = await get_group(message.chat.id)
+        if not group:
+            return await leave_chat(bot, message.chat.id)
+        
+        if message.from_user.id != group["user_id"]:
+            return await message.reply(f"⚠️ Only {group['user_name']} can do this")
+        
+        # Words that alone never make a search, empty list clears them
+        stopwords = sorted({word.lower() for word in message.command[1:]})
+        await update_group(message.chat.id, {"stopwords": stopwords})
+        
+        if stopwords:
+            await message.reply(f"✅ Ignoring chat made only of: `{' '.join(stopwords)}`")
+        else:
+            await message.reply("✅ Group stopwords cleared")
+        
+    except Exception as e:
+        logger.error(f"Stopwords error: {e}")
+        await message.reply("⚠️ An error occurred!")
+
 @Client.on_message(filters.group & filters.command("connections"))
+@track("connections")
 async def list_connections(bot, message):
     try:
         group = await get_group(message.chat.id)
@@ -159,18 +199,21 @@ async def list_connections(bot, message):
         
         response = "🔗 **Group Connections:**\n\n"
         
+        # Resolve every channel at once
+        chats = await get_chats_info(bot, channels + ([f_sub] if f_sub else []))
+        
         for idx, channel_id in enumerate(channels, 1):
-            try:
-                chat = await bot.get_chat(channel_id)
+            chat = chats.get(channel_id)
+            if chat:
                 response += f"{idx}. 📢 [{chat.title}]({chat.invite_link}) `{channel_id}`\n"
-            except:
+            else:
                 response += f"{idx}. 📢 `{channel_id}` (Invalid)\n"
         
         if f_sub:
-            try:
-                chat = await bot.get_chat(f_sub)
+            chat = chats.get(f_sub)
+            if chat:
                 response += f"\n🔔 **Force Subscribe:** [{chat.title}]({chat.invite_link}) `{f_sub}`"
-            except:
+            else:
                 response += f"\n🔔 **Force Subscribe:** `{f_sub}` (Invalid)"
         
         await message.reply(response, disable_web_page_preview=True)
@@ -1,25 +1,40 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from config import DATABASE_URL, DATABASE_NAME
 import logging
+from utils.db import db, posts_col, users_col, groups_col
 
 logger = logging.getLogger(__name__)
 
 class Database:
     def __init__(self):
-        self._client = AsyncIOMotorClient(DATABASE_URL)
-        self.db = self._client[DATABASE_NAME]
-        self.col = self.db["Posts"]
-        self.users_col = self.db["Users"]
-        self.groups_col = self.db["Groups"]
+        self.db = db
+        self.col = posts_col
+        self.users_col = users_col
+        self.groups_col = groups_col
 
     async def insert_post(self, data):
-        return await self.col.insert_one(data)
+        # Re-posting or editing a message replaces its indexed copy
+        return await self.col.update_one(
+            {"channel_id": data["channel_id"], "message_id": data["message_id"]},
+            {"$set": data},
+            upsert=True
+        )
+
+    async def delete_posts(self, channel_id, message_ids):
+        return await self.col.delete_many(
+            {"channel_id": channel_id, "message_id": {"$in": message_ids}}
+        )
 
-    async def search_posts(self, query):
-        return await self.col.find(
-            {"$text": {"$search": query}},
-            {"score": {"$meta": "textScore"}}
-        ).sort("score", -1).to_list(None)
+    async def search_posts(self, query, channels=None, skip=0, limit=10):
+        filter = {"$text": {"$search": query}}
+        if channels is not None:
+            filter["channel_id"] = {"$in": channels}
+        # Only what result rendering needs
+        projection = {
+            "_id": 0, "channel_id": 1, "message_id": 1, "username": 1, "title": 1,
+            "score": {"$meta": "textScore"}
+        }
+        return await self.col.find(filter, projection).sort(
+            [("score", {"$meta": "textScore"})]
+        ).skip(skip).limit(limit).to_list(limit)
 
     async def find_user(self, user_id):
         return await self.users_col.find_one({"_id": user_id})
@@ -1,16 +1,51 @@
 import logging
-import asyncio
 from pyrogram import Client, filters, enums
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from pyrogram.errors import UserNotParticipant
-from utils.helpers import get_group, save_pending_request, delete_after_delay
+from utils.helpers import get_group, save_pending_request, get_pending_request, fsub_channels
+from utils.scheduler import schedule_delete
+from utils.cache import TTLCache
+from utils.chats import get_chat_info
 from utils.script import script
-from info import LOG_CHANNEL
+from utils.metrics import track
+from info import LOG_CHANNEL, FSUB_CACHE_SIZE, FSUB_POSITIVE_TTL, FSUB_NEGATIVE_TTL
 
 logger = logging.getLogger(__name__)
 
+MEMBER_STATUSES = [
+    enums.ChatMemberStatus.ADMINISTRATOR,
+    enums.ChatMemberStatus.OWNER,
+    enums.ChatMemberStatus.MEMBER
+]
+
+# (f_sub channel, user_id) -> is member
+membership_cache = TTLCache(maxsize=FSUB_CACHE_SIZE, ttl=FSUB_POSITIVE_TTL)
+
+def cache_membership(f_sub, user_id, is_member):
+    ttl = FSUB_POSITIVE_TTL if is_member else FSUB_NEGATIVE_TTL
+    membership_cache.set((f_sub, user_id), is_member, ttl=ttl)
+
+async def is_subscribed(bot, f_sub, user_id, recheck=False):
+    """Check membership, asking Telegram only on a cache miss
+
+    With recheck a cached "not joined" is ignored, for users who say
+    they have just joined.
+    """
+    fsub_channels.add(f_sub)
+    cached = membership_cache.get((f_sub, user_id))
+    if cached or (cached is not None and not recheck):
+        return cached
+    try:
+        member = await bot.get_chat_member(f_sub, user_id)
+        is_member = member.status in MEMBER_STATUSES
+    except UserNotParticipant:
+        is_member = False
+    cache_membership(f_sub, user_id, is_member)
+    return is_member
+
 async def force_sub(bot, message):
     """Force subscribe check without bans/restrictions"""
+    admin_id = None
     try:
         # Skip if no user context
         if not message.from_user:
@@ -28,25 +63,13 @@ async def force_sub(bot, message):
         if not f_sub:
             return True
 
-        try:
-            # Get force sub channel
-            channel = await bot.get_chat(f_sub)
-            invite_link = channel.invite_link
-            
-            # Check user status
-            member = await bot.get_chat_member(f_sub, message.from_user.id)
-            status = member.status
+        # Allow if user is member
+        if await is_subscribed(bot, f_sub, message.from_user.id):
+            return True
             
-            # Allow if user is member
-            if status in [
-                enums.ChatMemberStatus.ADMINISTRATOR,
-                enums.ChatMemberStatus.OWNER,
-                enums.ChatMemberStatus.MEMBER
-            ]:
-                return True
-                
-        except UserNotParticipant:
-            pass  # Will handle below
+        # Get force sub channel
+        channel = await get_chat_info(bot, f_sub)
+        invite_link = channel.invite_link
             
         # User not in channel - store search request
         await save_pending_request(
@@ -65,7 +88,7 @@ async def force_sub(bot, message):
         )
         
         # Schedule message deletion
-        asyncio.create_task(delete_after_delay(join_msg, 60))
+        schedule_delete(join_msg, 60)
         return False
             
     except Exception as e:
@@ -79,6 +102,7 @@ async def force_sub(bot, message):
         return True  # Allow search on errors
 
 @Client.on_callback_query(filters.regex(r"^retry_search_"))
+@track("retry_search")
 async def handle_retry_search(bot, update):
     """Handle search retry after joining channel"""
     try:
@@ -102,17 +126,7 @@ async def handle_retry_search(bot, update):
             await update.answer("❌ Force sub not configured", show_alert=True)
             return
             
-        try:
-            member = await bot.get_chat_member(group["f_sub"], user_id)
-            if member.status not in [
-                enums.ChatMemberStatus.ADMINISTRATOR,
-                enums.ChatMemberStatus.OWNER,
-                enums.ChatMemberStatus.MEMBER
-            ]:
-                # Not joined
-                await update.answer("❌ Please join channel first!", show_alert=True)
-                return
-        except UserNotParticipant:
+        if not await is_subscribed(bot, group["f_sub"], user_id, recheck=True):
             await update.answer("❌ You haven't joined yet!", show_alert=True)
             return
             
@@ -121,9 +135,19 @@ async def handle_retry_search(bot, update):
         await update.message.delete()
         
         # Trigger search handler
-        from plugins.Search import perform_search
+        from plugins.search import perform_search
         await perform_search(bot, request["chat_id"], user_id, request["query"])
         
     except Exception as e:
         logger.error(f"Retry search error: {str(e)}")
         await update.answer("⚠️ Error occurred!", show_alert=True)
+
+@Client.on_chat_member_updated(filters.create(lambda _, __, update: update.chat.id in fsub_channels))
+@track("fsub_member_update")
+async def track_fsub_members(bot, update):
+    """Keep membership cache in sync with joins and leaves"""
+    member = update.new_chat_member or update.old_chat_member
+    if not member or not member.user:
+        return
+    is_member = bool(update.new_chat_member) and update.new_chat_member.status in MEMBER_STATUSES
+    cache_membership(update.chat.id, member.user.id, is_member)
@@ -6,10 +6,13 @@ from pyrogram.errors import (
 )
 from info import API_ID, API_HASH, ADMIN
 from plugins.database import database
+from utils.userbot import userbot
+from utils.metrics import track
 
 logger = logging.getLogger(__name__)
 
 @Client.on_message(filters.command("login") & filters.user(ADMIN))
+@track("login")
 async def login_handler(bot, message):
     try:
         user_data = await database.find_user(ADMIN)
@@ -46,17 +49,21 @@ async def login_handler(bot, message):
         session_string = await temp_client.export_session_string()
         await database.update_user(ADMIN, {"session": session_string})
         
-        await message.reply("✅ Login successful! Session saved")
         await temp_client.disconnect()
+        await userbot.reload()
+        await message.reply("✅ Login successful! Session saved")
         
     except Exception as e:
         logger.error(f"Login error: {e}")
         await message.reply("⚠️ Login failed!")
 
 @Client.on_message(filters.command("logout") & filters.user(ADMIN))
+@track("logout")
 async def logout_handler(bot, message):
     try:
         await database.update_user(ADMIN, {"session": None})
+        # Disconnects it, as no session is stored any more
+        await userbot.reload()
         await message.reply("✅ Logout successful! Session removed")
     except Exception as e:
         logger.error(f"Logout error: {e}")
@@ -1,12 +1,17 @@
 import logging
+from datetime import datetime
 from pyrogram import Client, filters
-from utils.helpers import add_user, total_users_count, total_chat_count
+from utils.helpers import add_user, total_users_count
+from utils.counters import counters
 from utils.script import script
-from info import ADMIN
+from utils.metrics import track, profile
+from utils.db import workers_col
+from info import ADMIN, WORKERS, WORKER_STALE_AFTER
 
 logger = logging.getLogger(__name__)
 
 @Client.on_message(filters.command("start") & filters.private)
+@track("start")
 async def start_command(bot, message):
     try:
         await add_user(message.from_user.id, message.from_user.first_name)
@@ -15,6 +20,7 @@ async def start_command(bot, message):
         logger.error(f"Start error: {e}")
 
 @Client.on_message(filters.command("help"))
+@track("help")
 async def help_command(bot, message):
     try:
         await message.reply(script.HELP, disable_web_page_preview=True)
@@ -22,24 +28,28 @@ async def help_command(bot, message):
         logger.error(f"Help error: {e}")
 
 @Client.on_message(filters.command("about"))
+@track("about")
 async def about_command(bot, message):
     try:
-        me = await bot.get_me()
+        me = bot.me or await bot.get_me()
         await message.reply(script.ABOUT.format(me.mention), disable_web_page_preview=True)
     except Exception as e:
         logger.error(f"About error: {e}")
 
 @Client.on_message(filters.command("stats") & filters.user(ADMIN))
+@track("stats")
 async def stats_command(bot, message):
     try:
-        users = await total_users_count()
-        groups = await total_chat_count()
-        await message.reply(script.STATS.format(users, groups))
+        stats = counters.snapshot()
+        await message.reply(script.STATS.format(
+            stats["users"], stats["groups"], stats["verified_groups"], stats["channels"]
+        ))
     except Exception as e:
         logger.error(f"Stats error: {e}")
         await message.reply("⚠️ Error getting stats")
 
 @Client.on_message(filters.command("id"))
+@track("id")
 async def id_command(bot, message):
     try:
         text = f"**Chat ID:** `{message.chat.id}`\n"
@@ -55,6 +65,7 @@ async def id_command(bot, message):
         await message.reply("⚠️ Error getting IDs")
 
 @Client.on_message(filters.command("userc") & filters.user(ADMIN))
+@track("userc")
 async def user_count_command(bot, message):
     try:
         count = await total_users_count()
@@ -62,3 +73,56 @@ async def user_count_command(bot, message):
     except Exception as e:
         logger.error(f"User count error: {e}")
         await message.reply("⚠️ Error getting user count")
+
+@Client.on_message(filters.command("perf") & filters.user(ADMIN))
+@track("perf")
+async def perf_command(bot, message):
+    try:
+        rows = sorted(profile.table().items(), key=lambda row: row[1]["p95"], reverse=True)
+        if not rows:
+            return await message.reply("No handler timings yet")
+        lines = [f"{'handler':<16}{'calls':>7}{'err':>5}{'p50':>7}{'p95':>7}{'p99':>7}{'io':>7}"]
+        for name, row in rows:
+            lines.append(
+                f"{name:<16}{row['calls']:>7}{row['errors']:>5}"
+                f"{row['p50'] * 1000:>7.0f}{row['p95'] * 1000:>7.0f}{row['p99'] * 1000:>7.0f}"
+                f"{row['awaited'] * 1000:>7.0f}"
+            )
+        slow = [
+            f"{wall * 1000:>6.0f} ms  {name}  {query}"
+            for wall, name, query, _ in profile.slowest()
+        ]
+        text = "⏱ **Handler timings (ms)**\n```\n" + "\n".join(lines) + "\n```"
+        if slow:
+            text += "\n🐢 **Slowest recent**\n```\n" + "\n".join(slow) + "\n```"
+        await message.reply(text)
+    except Exception as e:
+        logger.error(f"Perf error: {e}")
+        await message.reply("⚠️ Error getting timings")
+
+@Client.on_message(filters.command("workers") & filters.user(ADMIN))
+@track("workers")
+async def workers_command(bot, message):
+    try:
+        if not WORKERS:
+            return await message.reply("Running as a single process")
+        now = datetime.utcnow()
+        docs = {doc["_id"]: doc for doc in await workers_col.find({}).to_list(None)}
+        receiver = docs.get("receiver", {})
+        dispatched = receiver.get("dispatched") or [0] * WORKERS
+        restarts = receiver.get("restarts") or [0] * WORKERS
+        lines = [f"{'worker':<8}{'state':<7}{'seen':>6}{'sent':>9}{'done':>9}{'queue':>7}{'restarts':>9}"]
+        for index in range(WORKERS):
+            doc = docs.get(f"worker-{index}")
+            seen = (now - doc["last_seen"]).total_seconds() if doc else None
+            state = "up" if seen is not None and seen < WORKER_STALE_AFTER else "DOWN"
+            lines.append(
+                f"{index:<8}{state:<7}{(f'{seen:.0f}s' if seen is not None else '-'):>6}"
+                f"{dispatched[index] if index < len(dispatched) else 0:>9}"
+                f"{doc.get('received', 0) if doc else 0:>9}{doc.get('pending', 0) if doc else 0:>7}"
+                f"{restarts[index] if index < len(restarts) else 0:>9}"
+            )
+        await message.reply("🧩 **Workers**\n```\n" + "\n".join(lines) + "\n```")
+    except Exception as e:
+        logger.error(f"Workers error: {e}")
+        await message.reply("⚠️ Error getting worker status")
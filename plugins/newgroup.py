@@ -1,17 +1,20 @@
 import logging
-import asyncio
 from pyrogram import Client, filters
 from utils.helpers import add_group
+from utils.chats import forget_chat
+from utils.scheduler import schedule_delete
 from utils.script import script
+from utils.metrics import track
 from info import LOG_CHANNEL
 
 logger = logging.getLogger(__name__)
 
 @Client.on_message(filters.group & filters.new_chat_members)
+@track("new_group")
 async def new_group_handler(bot, message):
     try:
-        # Check if bot was added
-        bot_id = (await bot.get_me()).id
+        # Check if bot was added, bot.me is fetched once by bot.start()
+        bot_id = (bot.me or await bot.get_me()).id
         if bot_id not in [user.id for user in message.new_chat_members]:
             return
         
@@ -32,8 +35,7 @@ async def new_group_handler(bot, message):
         
         # Send welcome message
         welcome_msg = await message.reply(script.START.format(message.chat.title))
-        await asyncio.sleep(60)
-        await welcome_msg.delete()
+        schedule_delete(welcome_msg, 60)
         
         # Log to channel
         log_text = (
@@ -47,3 +49,9 @@ async def new_group_handler(bot, message):
         
     except Exception as e:
         logger.error(f"New group error: {str(e)}")
+
+@Client.on_message(filters.new_chat_title | filters.left_chat_member)
+@track("chat_changed")
+async def chat_changed_handler(bot, message):
+    """Renames and departures change the cached title and member count"""
+    forget_chat(message.chat.id)
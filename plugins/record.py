@@ -0,0 +1,20 @@
+import logging
+from pyrogram import Client
+from utils.recorder import recorder
+
+logger = logging.getLogger(__name__)
+
+# Group -1 sees every update before the real handlers and never stops
+# propagation. Nothing is registered unless RECORD_UPDATES is set.
+if recorder:
+    @Client.on_message(group=-1)
+    async def record_message(bot, message):
+        recorder.message(message)
+
+    @Client.on_callback_query(group=-1)
+    async def record_callback_query(bot, query):
+        recorder.callback_query(query)
+
+    @Client.on_chat_member_updated(group=-1)
+    async def record_chat_member(bot, update):
+        recorder.chat_member(update)
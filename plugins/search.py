@@ -1,13 +1,123 @@
 import logging
-import asyncio
+import secrets
 from pyrogram import Client, filters
-from utils.helpers import get_group, perform_fast_channel_search, delete_after_delay
-from plugins.Fsub import force_sub
-from info import API_ID, API_HASH
-from plugins.generate import database  # Your session manager
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from utils.helpers import get_group, group_cache, post_link, touch_user
+from utils.prefilter import prefilter
+from utils.ratelimit import SearchLimiter
+from utils.scheduler import schedule_delete
+from utils.cache import TTLCache, SingleFlight
+from utils.search import perform_fast_channel_search, result_cache, ResultCache
+from utils.trigram import trigram_index
+from utils.userbot import userbot
+from utils.metrics import track, search_outcomes
+from utils.cluster import cluster
+from plugins.database import database
+from plugins.fsub import force_sub
+from info import (
+    SEARCH_PAGE_SIZE, SEARCH_SESSION_TTL, RESULT_CACHE_EMPTY_TTL,
+    SEARCH_USER_LIMIT, SEARCH_USER_WINDOW, SEARCH_GROUP_LIMIT, SEARCH_GROUP_WINDOW
+)
 
 logger = logging.getLogger(__name__)
 
+MAX_RESULTS_LENGTH = 3500
+
+# Navigation token -> (query, channels) of a results message
+search_sessions = TTLCache(maxsize=10000, ttl=SEARCH_SESSION_TTL)
+search_limiter = SearchLimiter(
+    SEARCH_USER_LIMIT, SEARCH_USER_WINDOW, SEARCH_GROUP_LIMIT, SEARCH_GROUP_WINDOW
+)
+# Identical searches running at the same time share one backend call
+search_flights = SingleFlight()
+
+def format_results(posts, start=1):
+    """Render indexed posts as a list of message links"""
+    lines = []
+    length = 0
+    for idx, post in enumerate(posts, start):
+        link = post_link(post["channel_id"], post["message_id"], post.get("username"))
+        title = (post.get("title") or "Post").replace("[", "").replace("]", "")
+        line = f"{idx}. [{title}]({link})"
+        length += len(line) + 1
+        if length > MAX_RESULTS_LENGTH:
+            break
+        lines.append(line)
+    return "\n".join(lines)
+
+async def live_search(channels, query):
+    """Search Telegram through the user session and index what it finds
+
+    Only the primary worker has the session, elsewhere this finds nothing.
+    """
+    user_client = await userbot.get()
+    if not user_client:
+        return []
+    result = await perform_fast_channel_search(user_client, channels, query)
+    if "error" in result.timings.values():
+        # Health check the session before the next search
+        userbot.invalidate()
+    for post in result.posts:
+        await database.insert_post(post)
+        trigram_index.add(post)
+        result_cache.invalidate_channel(post["channel_id"])
+        cluster.publish("post", post)
+    return result.posts
+
+async def load_page(query, channels, page):
+    """One page of posts, plus one extra when another page exists
+
+    Only the local index pages on, fuzzy and live results are one page.
+    """
+    if page == 0:
+        # Same query over the same channels is served from memory
+        posts = result_cache.get(query, channels)
+        source = "cache"
+        if posts is None:
+            # Answer from the local post index
+            posts = await database.search_posts(query, channels, limit=SEARCH_PAGE_SIZE + 1)
+            source = "index"
+            if not posts:
+                # Misspelt titles only match approximately
+                posts = trigram_index.search(query, channels, limit=SEARCH_PAGE_SIZE)
+                source = "fuzzy"
+            if not posts:
+                # Channels that are not indexed yet are searched live
+                posts = (await live_search(channels, query))[:SEARCH_PAGE_SIZE]
+                source = "live"
+            result_cache.set(query, channels, posts, ttl=None if posts else RESULT_CACHE_EMPTY_TTL)
+        search_outcomes.inc(source if posts else "none")
+        return posts
+
+    posts = result_cache.get(query, channels, page)
+    if posts is None:
+        posts = await database.search_posts(
+            query, channels, skip=page * SEARCH_PAGE_SIZE, limit=SEARCH_PAGE_SIZE + 1
+        )
+        result_cache.set(query, channels, posts, page=page)
+    return posts
+
+async def fetch_page(query, channels, page):
+    return await search_flights.do(
+        (ResultCache.key(query, channels), page),
+        lambda: load_page(query, channels, page)
+    )
+
+def build_page(token, query, posts, page):
+    """Results text and prev/next keyboard for one page"""
+    results = format_results(posts[:SEARCH_PAGE_SIZE], start=page * SEARCH_PAGE_SIZE + 1)
+    response = (
+        f"🔍 Results for: `{query}`\n\n"
+        f"{results}\n\n"
+        f"✨ Powered by @RMCBACKUP"
+    )
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"page_{token}_{page - 1}"))
+    if len(posts) > SEARCH_PAGE_SIZE:
+        buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"page_{token}_{page + 1}"))
+    return response, InlineKeyboardMarkup([buttons]) if buttons else None
+
 async def perform_search(bot, chat_id, user_id, query):
     """Actual search implementation"""
     try:
@@ -16,51 +126,48 @@ async def perform_search(bot, chat_id, user_id, query):
         if not group or not group.get("channels"):
             return
             
-        # Get user session
-        vj = database.find_one({"chat_id": ADMIN})
-        if not vj:
-            return
+        posts = await fetch_page(query, group["channels"], 0)
             
-        # Connect user client
-        async with Client(
-            "user_session", 
-            session_string=vj['session'], 
-            api_hash=API_HASH, 
-            api_id=API_ID
-        ) as user_client:
-            # Perform search
-            results = await perform_fast_channel_search(
-                user_client, 
-                group["channels"], 
-                query
+        if posts:
+            token = secrets.token_hex(4)
+            search_sessions.set(token, (query, group["channels"]))
+            response, markup = build_page(token, query, posts, 0)
+            msg = await bot.send_message(
+                chat_id, response, reply_markup=markup, disable_web_page_preview=True
             )
-            
-            if results:
-                # Format response
-                response = (
-                    f"🔍 Results for: `{query}`\n\n"
-                    f"{results}\n\n"
-                    f"✨ Powered by @RMCBACKUP"
-                )
-                msg = await bot.send_message(chat_id, response)
-                asyncio.create_task(delete_after_delay(msg, 40))
-            else:
-                # No results
-                msg = await bot.send_message(
-                    chat_id,
-                    f"🔍 No results found for: `{query}`\n\nRequest admin to add content:",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("📬 Request Content", callback_data=f"request_{query}")
-                    ]])
-                )
-                asyncio.create_task(delete_after_delay(msg, 40))
+            schedule_delete(msg, 40)
+        else:
+            # No results
+            msg = await bot.send_message(
+                chat_id,
+                f"🔍 No results found for: `{query}`\n\nRequest admin to add content:",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("📬 Request Content", callback_data=f"request_{query}")
+                ]])
+            )
+            schedule_delete(msg, 40)
                 
     except Exception as e:
         logger.error(f"Search error: {str(e)}")
 
-@Client.on_message(filters.group & filters.text & ~filters.command)
+def _looks_like_search(_, __, message):
+    # Runs before any I/O, so per-group stopwords only come from the cache
+    group = group_cache.peek(message.chat.id)
+    stopwords = group.get("stopwords") or () if group else ()
+    return prefilter.check(message.text, stopwords) is None
+
+@Client.on_message(filters.group & filters.text & filters.create(_looks_like_search))
+@track("search")
 async def search_handler(bot, message):
     """Main search handler"""
+    # Anonymous admins and linked channel posts have no user to answer
+    if not message.from_user:
+        return
+    # Excess queries from one user or group are dropped silently
+    if not search_limiter.allow(message.chat.id, message.from_user.id):
+        return
+    touch_user(message.from_user.id)
+        
     # First check force sub
     if not await force_sub(bot, message):
         return
@@ -73,7 +180,32 @@ async def search_handler(bot, message):
         message.text
     )
 
+@Client.on_callback_query(filters.regex(r"^page_"))
+@track("search_page")
+async def handle_page(bot, update):
+    """Show another page of search results"""
+    try:
+        _, token, page = update.data.split("_")
+        page = int(page)
+        session = search_sessions.get(token)
+        if not session:
+            return await update.answer("⌛ Search expired, search again", show_alert=True)
+        
+        query, channels = session
+        posts = await fetch_page(query, channels, page)
+        if not posts:
+            return await update.answer("🔍 No more results")
+        
+        response, markup = build_page(token, query, posts, page)
+        await update.message.edit(response, reply_markup=markup, disable_web_page_preview=True)
+        await update.answer()
+        
+    except Exception as e:
+        logger.error(f"Page error: {str(e)}")
+        await update.answer("⚠️ Error occurred!", show_alert=True)
+
 @Client.on_callback_query(filters.regex(r"^request_"))
+@track("content_request")
 async def handle_request(bot, update):
     """Handle content requests"""
     try:
@@ -1,18 +1,21 @@
 import logging
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from utils.helpers import get_group, update_group
+from utils.helpers import get_group, update_group, delete_group
+from utils.chats import get_chat_info, remember_invite_link, forget_chat, leave_chat
 from utils.script import script
+from utils.metrics import track
 from info import LOG_CHANNEL
 
 logger = logging.getLogger(__name__)
 
 @Client.on_message(filters.group & filters.command("verify"))
+@track("verify")
 async def verify_group(bot, message):
     try:
         group = await get_group(message.chat.id)
         if not group:
-            await bot.leave_chat(message.chat.id)
+            await leave_chat(bot, message.chat.id)
             return
         
         admin_id = group["user_id"]
@@ -31,13 +34,14 @@ async def verify_group(bot, message):
         
         # Get group invite link
         try:
-            chat = await bot.get_chat(message.chat.id)
+            chat = await get_chat_info(bot, message.chat.id)
             invite_link = chat.invite_link
             if not invite_link:
                 # Create invite link if not available
                 invite_link = (await bot.create_chat_invite_link(
                     message.chat.id, creates_join_request=True
                 )).invite_link
+                remember_invite_link(message.chat.id, invite_link)
         except Exception:
             return await message.reply(
                 "❌ I need 'Invite Users' permission to generate links!"
@@ -75,6 +79,7 @@ async def verify_group(bot, message):
         await message.reply("⚠️ An error occurred!")
 
 @Client.on_callback_query(filters.regex(r"^verify_(approve|reject)_"))
+@track("verify_callback")
 async def verify_callback(bot, update):
     try:
         action = update.data.split("_")[1]
@@ -102,6 +107,7 @@ async def verify_callback(bot, update):
         else:
             # Reject verification
             await delete_group(group_id)
+            forget_chat(group_id)
             await bot.send_message(
                 group["user_id"],
                 f"❌ Your group {group['name']} was rejected!"
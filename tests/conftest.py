@@ -0,0 +1,6 @@
+import os
+import sys
+
+# utils.db builds its (lazy) Mongo client at import time
+os.environ.setdefault("DATABASE_URI", "mongodb://localhost:27017")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
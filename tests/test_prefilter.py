@@ -0,0 +1,46 @@
+import pytest
+from info import PREFILTER_MIN_LENGTH, PREFILTER_MAX_LENGTH, PREFILTER_MAX_WORDS, PREFILTER_STOPWORDS
+from utils.prefilter import Prefilter
+
+@pytest.fixture
+def prefilter():
+    return Prefilter(PREFILTER_MIN_LENGTH, PREFILTER_MAX_LENGTH, PREFILTER_MAX_WORDS, PREFILTER_STOPWORDS)
+
+@pytest.mark.parametrize("text", [
+    "1917", "2012", "300", "Up", "It", "Welcome", "Good Night", "Thank You",
+    "Here", "Me Before You", "Movie 43", "Hello", "English Vinglish", "KGF 2",
+    "avengers endgame 2019", "Kuch Kuch Hota Hai"
+])
+def test_titles_pass(prefilter, text):
+    assert prefilter._reason(text, ()) is None
+
+@pytest.mark.parametrize("text, reason", [
+    ("/start", "command"),
+    ("k", "too_short"),
+    ("x" * 101, "too_long"),
+    ("see https://example.com", "link"),
+    ("join t.me/somechannel", "link"),
+    ("@someone", "mention"),
+    ("#request", "mention"),
+    ("42", "no_letters"),
+    ("🔥🔥🔥", "no_letters"),
+    ("?!", "no_letters"),
+    ("a 🔥🔥🔥🔥", "symbols"),
+    ("please send me the link for this movie right now bro", "sentence"),
+    ("hahahahaha", "repeat"),
+    ("hi", "stopword"),
+    ("thanks bro", "stopword"),
+    ("ok sir", "stopword")
+])
+def test_chatter_dropped(prefilter, text, reason):
+    assert prefilter._reason(text, ()) == reason
+
+def test_group_stopwords(prefilter):
+    assert prefilter._reason("welcome", {"welcome"}) == "stopword"
+    assert prefilter._reason("welcome back", {"welcome"}) is None
+
+def test_check_counts(prefilter):
+    prefilter.check("1917")
+    prefilter.check("hi")
+    prefilter.check(None)
+    assert prefilter.stats() == {"passed": 1, "dropped": 2, "stopword": 1, "too_short": 1}
@@ -0,0 +1,25 @@
+import asyncio
+import time
+from utils.ratelimit import TokenBucket
+
+def test_rate_below_one_per_second():
+    async def run():
+        bucket = TokenBucket(0.8)
+        start = time.monotonic()
+        await asyncio.wait_for(bucket.acquire(), 1)
+        first = time.monotonic() - start
+        await asyncio.wait_for(bucket.acquire(), 3)
+        return first, time.monotonic() - start
+    first, second = asyncio.run(run())
+    assert first < 0.1
+    # One token every 1.25 s
+    assert 1.1 < second < 1.6
+
+def test_capacity_allows_a_burst():
+    async def run():
+        bucket = TokenBucket(1, capacity=3)
+        start = time.monotonic()
+        for _ in range(3):
+            await asyncio.wait_for(bucket.acquire(), 1)
+        return time.monotonic() - start
+    assert asyncio.run(run()) < 0.1
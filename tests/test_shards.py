@@ -0,0 +1,41 @@
+import asyncio
+import random
+from bench.mongo import MemoryCollection
+from utils.helpers import id_ranges, iter_collection
+
+def walk(col, shards, query=None):
+    async def run():
+        ranges = await id_ranges(col, shards)
+        return ranges, [
+            [doc["_id"] async for doc in iter_collection(col, query, id_range=id_range)]
+            for id_range in ranges
+        ]
+    return asyncio.run(run())
+
+def filled(ids):
+    col = MemoryCollection("users")
+    for user_id in random.Random(1).sample(ids, len(ids)):
+        col._insert({"_id": user_id, "active": user_id % 3 == 0})
+    return col
+
+def test_shards_cover_collection_without_overlap():
+    ids = list(range(1000, 3000, 7))
+    ranges, shards = walk(filled(ids), 6)
+    assert len(ranges) == 6
+    assert all(shards)
+    # Each shard walks its own ascending slice, together they are every _id once
+    assert [user_id for shard in shards for user_id in shard] == sorted(ids)
+
+def test_shards_keep_the_query():
+    ids = list(range(500))
+    _, shards = walk(filled(ids), 4, {"active": True})
+    assert [user_id for shard in shards for user_id in shard] == [i for i in ids if i % 3 == 0]
+
+def test_more_shards_than_documents():
+    _, shards = walk(filled([5, 9]), 8)
+    assert [user_id for shard in shards for user_id in shard] == [5, 9]
+
+def test_empty_collection_is_one_open_range():
+    ranges, shards = walk(MemoryCollection("users"), 4)
+    assert ranges == [(None, None)]
+    assert shards == [[]]
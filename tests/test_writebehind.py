@@ -0,0 +1,67 @@
+import asyncio
+from pymongo import UpdateOne
+from utils.writebehind import UserWriteBuffer
+
+class FakeUsers:
+    """Collection double recording bulk writes, optionally failing or slow"""
+
+    def __init__(self, fail=0, delay=0):
+        self.fail = fail
+        self.delay = delay
+        self.writes = []
+
+    async def bulk_write(self, ops, ordered=True):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("not primary")
+        self.writes.append(ops)
+        return object()
+
+def upsert(user_id, entry):
+    return UpdateOne(
+        {"_id": user_id},
+        {"$set": dict(entry["set"]), "$setOnInsert": {"joined_at": entry["joined_at"]}},
+        upsert=True
+    )
+
+def test_failed_add_merges_with_newer_touch():
+    async def run():
+        col = FakeUsers(fail=1)
+        buffer = UserWriteBuffer(col, interval=60, max_pending=1000)
+        buffer.add(1, "alice")
+        joined_at = buffer._pending[1]["joined_at"]
+
+        flushing = asyncio.ensure_future(buffer.flush())
+        await asyncio.sleep(0)
+        # Arrives while the failing flush is in flight
+        buffer.touch(1)
+        touched = buffer._pending[1]["set"]["last_seen"]
+        assert await flushing is None
+
+        await buffer.flush()
+        assert col.writes == [[UpdateOne(
+            {"_id": 1},
+            {"$set": {"name": "alice", "last_seen": touched}, "$setOnInsert": {"joined_at": joined_at}},
+            upsert=True
+        )]]
+
+    asyncio.run(run())
+
+def test_stop_keeps_batch_in_flight():
+    async def run():
+        col = FakeUsers(delay=0.2)
+        buffer = UserWriteBuffer(col, interval=0.01, max_pending=1000)
+        buffer.start()
+        buffer.add(1, "alice")
+        alice = upsert(1, buffer._pending[1])
+        await asyncio.sleep(0.05)
+        # The loop took the batch and is waiting on bulk_write
+        assert len(buffer) == 0 and not col.writes
+        buffer.add(2, "bob")
+        bob = upsert(2, buffer._pending[2])
+        await buffer.stop()
+        assert col.writes == [[alice], [bob]]
+        assert len(buffer) == 0
+
+    asyncio.run(run())
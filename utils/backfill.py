@@ -0,0 +1,242 @@
+import asyncio
+import logging
+from datetime import datetime
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pyrogram.errors import FloodWait, ChannelPrivate, ChannelInvalid, PeerIdInvalid
+from info import BACKFILL_RATE, BACKFILL_CONCURRENCY, BACKFILL_POLL_INTERVAL, BACKFILL_MAX_ATTEMPTS, LOG_CHANNEL
+from utils.db import posts_col, backfills_col
+from utils.helpers import is_channel_connected
+from utils.ratelimit import TokenBucket
+from utils.search import post_data, result_cache
+from utils.trigram import trigram_index
+from utils.userbot import userbot
+from utils.cluster import cluster
+
+logger = logging.getLogger(__name__)
+
+# Messages per GetHistory request, the most Telegram returns
+HISTORY_LIMIT = 100
+# The user session cannot read these channels, retrying will not help
+UNREADABLE = (ChannelPrivate, ChannelInvalid, PeerIdInvalid)
+
+@cluster.on("backfill")
+def posts_backfilled(channel_id, posts):
+    for post in posts:
+        trigram_index.add(post)
+    result_cache.invalidate_channel(channel_id)
+
+async def _insert(posts):
+    """Store posts and return the ones inserted, ones already indexed live are left as they are"""
+    if not posts:
+        return []
+    try:
+        await posts_col.insert_many(posts, ordered=False)
+        return posts
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        # Duplicate keys on (channel_id, message_id) are expected
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        skipped = {error["index"] for error in errors}
+        return [post for index, post in enumerate(posts) if index not in skipped]
+
+class Backfiller:
+    """Indexes the history of connected channels through the user session
+
+    Jobs are stored in Backfills, one per channel, with the oldest
+    message_id indexed so far, so a restart resumes where it stopped.
+    Any process can queue a job, only the primary one runs them, at most
+    BACKFILL_CONCURRENCY at once drawing on one BACKFILL_RATE budget.
+    """
+
+    def __init__(self):
+        self.bot = None
+        self.limiter = TokenBucket(BACKFILL_RATE)
+        self._running = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._warned = False
+
+    def start(self, bot):
+        self.bot = bot
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Jobs stop mid batch, they resume from their last checkpoint"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._running.values()):
+            task.cancel()
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self._pick_up()
+            except Exception as e:
+                logger.error(f"Backfill poll error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), BACKFILL_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _pick_up(self):
+        free = BACKFILL_CONCURRENCY - len(self._running)
+        if free <= 0:
+            return
+        query = {"status": {"$in": ["pending", "running"]}, "_id": {"$nin": list(self._running)}}
+        jobs = await backfills_col.find(query).sort("queued_at", ASCENDING).limit(free).to_list(free)
+        if not jobs:
+            return
+        client = await userbot.get()
+        if not client:
+            # Queued before the session went away, once per outage
+            if not self._warned:
+                logger.warning(f"{len(jobs)} backfills waiting for a user session, use /login")
+                self._warned = True
+            return
+        self._warned = False
+        for job in jobs:
+            self._spawn(client, job)
+
+    def _spawn(self, client, job):
+        task = asyncio.create_task(self._run(client, job))
+        self._running[job["_id"]] = task
+        task.add_done_callback(lambda _: self._running.pop(job["_id"], None))
+
+    async def _run(self, client, job):
+        channel_id = job["_id"]
+        try:
+            await backfills_col.update_one({"_id": channel_id}, {"$set": {"status": "running"}})
+            logger.info(f"Backfilling {channel_id} before message {job.get('last_id') or 'latest'}")
+            while True:
+                # A failed lookup counts as an attempt, not as a disconnect
+                if not await is_channel_connected(channel_id, strict=True):
+                    return await self._finish(job, "cancelled")
+                messages = await self._history(client, channel_id, job.get("last_id") or 0)
+                if not messages:
+                    return await self._finish(job, "completed")
+                await self._index(job, messages)
+        except UNREADABLE as e:
+            await self._finish(job, "failed", str(e))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            attempts = job.get("attempts", 0) + 1
+            logger.error(f"Backfill {channel_id} error, attempt {attempts}: {e}")
+            if attempts >= BACKFILL_MAX_ATTEMPTS:
+                return await self._finish(job, "failed", str(e))
+            # Left running, the next poll resumes from the checkpoint
+            await backfills_col.update_one({"_id": channel_id}, {"$set": {"attempts": attempts}})
+
+    async def _history(self, client, channel_id, offset_id):
+        """One GetHistory request: posts older than offset_id, newest first"""
+        while True:
+            await self.limiter.acquire()
+            try:
+                return [
+                    message async for message in
+                    client.get_chat_history(channel_id, limit=HISTORY_LIMIT, offset_id=offset_id)
+                ]
+            except FloodWait as e:
+                logger.warning(f"Backfill FloodWait {e.value}s")
+                self.limiter.pause(e.value)
+
+    async def _index(self, job, messages):
+        """Store one batch and checkpoint it"""
+        posts = await _insert([data for data in map(post_data, messages) if data])
+        job["last_id"] = messages[-1].id
+        job["indexed"] = job.get("indexed", 0) + len(posts)
+        # Errors count towards BACKFILL_MAX_ATTEMPTS only while nothing gets through
+        job["attempts"] = 0
+        await backfills_col.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"last_id": job["last_id"], "attempts": 0, "updated_at": datetime.utcnow()},
+             "$inc": {"indexed": len(posts)}}
+        )
+        if posts:
+            posts_backfilled(job["_id"], posts)
+            cluster.publish("backfill", job["_id"], posts)
+
+    async def _finish(self, job, status, error=None):
+        update = {"status": status, "finished_at": datetime.utcnow()}
+        if error:
+            update["error"] = error
+        await backfills_col.update_one({"_id": job["_id"]}, {"$set": update})
+        logger.info(f"Backfill {job['_id']} {status} with {job.get('indexed', 0)} posts {error or ''}")
+        if status == "cancelled":
+            return
+        try:
+            log_text = f"#BACKFILL_{status.upper()}\n\n📢 Channel: `{job['_id']}`\n📥 Posts: {job.get('indexed', 0)}"
+            if error:
+                log_text += f"\n⚠️ Error: {error}"
+            await self.bot.send_message(LOG_CHANNEL, log_text)
+        except Exception as e:
+            logger.warning(f"Backfill log error: {e}")
+
+backfiller = Backfiller()
+# A /connect in another worker wakes the primary's backfiller
+cluster.on("queue_backfill")(backfiller.wake)
+
+# Jobs whose channel gets walked again on the next /connect
+REQUEUE = ["failed", "cancelled", "disconnected"]
+
+async def queue_backfill(channel_id, group_id):
+    """Index the history of a newly connected channel in the background
+
+    Returns the status of the channel's job: "pending" once queued,
+    "running" or "completed" when another group already had it indexed,
+    None when nothing will be indexed, as without a user session. Only
+    failed or cancelled jobs, or ones whose channel was disconnected from
+    every group since, walk the history again.
+    """
+    if not await userbot.available():
+        return None
+    try:
+        await backfills_col.update_one(
+            {"_id": channel_id, "status": {"$in": REQUEUE}},
+            {"$set": {
+                "group_id": group_id,
+                "status": "pending",
+                "last_id": None,
+                "indexed": 0,
+                "attempts": 0,
+                "error": None,
+                "queued_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Waiting, running or done, nothing to queue
+        try:
+            job = await backfills_col.find_one({"_id": channel_id}, {"status": 1})
+        except Exception as e:
+            logger.error(f"Queue backfill error: {e}")
+            return None
+        return job["status"] if job else None
+    except Exception as e:
+        logger.error(f"Queue backfill error: {e}")
+        return None
+    backfiller.wake()
+    cluster.publish("queue_backfill")
+    return "pending"
+
+async def channel_disconnected(channel_id):
+    """Let a reconnect walk the history again once no group uses the channel
+
+    Posts of a disconnected channel stop being indexed live, a running
+    job cancels itself when it notices.
+    """
+    try:
+        if await is_channel_connected(channel_id, strict=True):
+            return
+        await backfills_col.update_one(
+            {"_id": channel_id, "status": "completed"}, {"$set": {"status": "disconnected"}}
+        )
+    except Exception as e:
+        logger.error(f"Backfill disconnect error: {e}")
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from pyrogram.errors import (
+    FloodWait, UserIsBlocked, InputUserDeactivated, UserDeactivated, PeerIdInvalid
+)
+from info import BROADCAST_CONCURRENCY, BROADCAST_RATE, BROADCAST_BATCH_SIZE, BROADCAST_PROGRESS_INTERVAL
+from utils.db import users_col, groups_col, broadcasts_col
+from utils.helpers import delete_users, iter_collection
+from utils.ratelimit import TokenBucket
+from utils.script import script
+
+logger = logging.getLogger(__name__)
+
+# One send budget for every running broadcast
+limiter = TokenBucket(BROADCAST_RATE)
+_running = set()
+
+TARGETS = {"users": users_col, "groups": groups_col}
+UNREACHABLE = (UserIsBlocked, InputUserDeactivated, UserDeactivated, PeerIdInvalid)
+
+async def _send(bot, job, chat_id):
+    while True:
+        await limiter.acquire()
+        try:
+            await bot.copy_message(chat_id, job["from_chat_id"], job["message_id"])
+            return "success"
+        except FloodWait as e:
+            logger.warning(f"Broadcast FloodWait {e.value}s")
+            limiter.pause(e.value)
+        except UNREACHABLE:
+            return "unreachable"
+        except Exception as e:
+            logger.error(f"Broadcast to {chat_id} failed: {str(e)}")
+            return "failed"
+
+async def _edit_progress(bot, job, state):
+    remaining = max(job["total"] - job["success"] - job["failed"], 0)
+    try:
+        await bot.edit_message_text(
+            job["status_chat_id"],
+            job["status_message_id"],
+            script.BROADCAST.format(state, job["total"], remaining, job["success"], job["failed"])
+        )
+    except FloodWait as e:
+        limiter.pause(e.value)
+    except Exception as e:
+        logger.warning(f"Broadcast progress error: {e}")
+
+async def _run(bot, job):
+    col = TARGETS[job["target"]]
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    last_edit = time.monotonic()
+
+    async def send(chat_id):
+        async with semaphore:
+            return await _send(bot, job, chat_id)
+
+    query = {} if job.get("last_id") is None else {"_id": {"$gt": job["last_id"]}}
+    batch = []
+    async for doc in iter_collection(col, query, {"_id": 1}, BROADCAST_BATCH_SIZE):
+        batch.append(doc["_id"])
+        if len(batch) < BROADCAST_BATCH_SIZE:
+            continue
+        await _process_batch(job, batch, await asyncio.gather(*(send(chat_id) for chat_id in batch)))
+        batch = []
+        if time.monotonic() - last_edit >= BROADCAST_PROGRESS_INTERVAL:
+            await _edit_progress(bot, job, "IN PROGRESS")
+            last_edit = time.monotonic()
+    if batch:
+        await _process_batch(job, batch, await asyncio.gather(*(send(chat_id) for chat_id in batch)))
+
+    await broadcasts_col.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": "completed", "finished_at": datetime.utcnow()}}
+    )
+    await _edit_progress(bot, job, "COMPLETED")
+
+async def _process_batch(job, batch, outcomes):
+    """Checkpoint a finished batch so a restart resumes after it"""
+    success = outcomes.count("success")
+    failed = len(outcomes) - success
+    unreachable = [chat_id for chat_id, outcome in zip(batch, outcomes) if outcome == "unreachable"]
+    if unreachable and job["target"] == "users":
+        await delete_users(unreachable)
+    job["last_id"] = batch[-1]
+    job["success"] += success
+    job["failed"] += failed
+    await broadcasts_col.update_one(
+        {"_id": job["_id"]},
+        {
+            "$set": {"last_id": job["last_id"]},
+            "$inc": {"success": success, "failed": failed, "pruned": len(unreachable)}
+        }
+    )
+
+def _spawn(bot, job):
+    async def runner():
+        try:
+            await _run(bot, job)
+        except Exception as e:
+            logger.error(f"Broadcast {job['_id']} error: {str(e)}")
+    task = asyncio.create_task(runner())
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+async def start_broadcast(bot, target, message, status_message):
+    """Persist a broadcast job and start sending in the background"""
+    job = {
+        "target": target,
+        "from_chat_id": message.chat.id,
+        "message_id": message.id,
+        "status_chat_id": status_message.chat.id,
+        "status_message_id": status_message.id,
+        "last_id": None,
+        "total": await TARGETS[target].estimated_document_count(),
+        "success": 0,
+        "failed": 0,
+        "pruned": 0,
+        "status": "running",
+        "created_at": datetime.utcnow()
+    }
+    result = await broadcasts_col.insert_one(job)
+    job["_id"] = result.inserted_id
+    _spawn(bot, job)
+    return job
+
+async def resume_broadcasts(bot):
+    """Pick up jobs interrupted by a restart"""
+    try:
+        async for job in broadcasts_col.find({"status": "running"}):
+            logger.info(f"Resuming broadcast {job['_id']} after {job.get('last_id')}")
+            _spawn(bot, job)
+    except Exception as e:
+        logger.error(f"Resume broadcasts error: {e}")
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """In-process LRU cache with per-entry expiry and hit/miss counters
+
+    With maxbytes set, entries are also evicted once the total of
+    sizeof(value) goes over it.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.peek(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def peek(self, key, default=None):
+        """Read without touching LRU order or counters"""
+        entry = self._data.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return default
+        return entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        size = self.sizeof(value)
+        self._remove(key)
+        self._data[key] = (value, expires, size)
+        self.bytes += size
+        while len(self._data) > self.maxsize or (
+            self.maxbytes is not None and self.bytes > self.maxbytes and len(self._data) > 1
+        ):
+            self._remove(next(iter(self._data)))
+
+    def pop(self, key, default=None):
+        entry = self._remove(key)
+        return default if entry is None else entry[0]
+
+    def keys(self):
+        return list(self._data)
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+        return entry
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
+
+class SingleFlight:
+    """Run one call per key at a time, concurrent callers share its result"""
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._inflight = {}
+
+    async def do(self, key, fn):
+        future = self._inflight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+        # A cancelled caller must not cancel the call the others wait on
+        return await asyncio.shield(future)
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "inflight": len(self._inflight)}
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from info import CHAT_CACHE_SIZE, CHAT_CACHE_TTL, CHAT_CACHE_STALE_TTL, CHAT_RESOLVE_CONCURRENCY
+from utils.cache import TTLCache
+from utils.cluster import cluster
+
+logger = logging.getLogger(__name__)
+
+ChatInfo = namedtuple("ChatInfo", ["id", "title", "invite_link", "members_count"])
+
+# chat_id -> (ChatInfo, fetched_at); entries outlive CHAT_CACHE_TTL so
+# stale ones can still be served while they are refreshed
+chat_cache = TTLCache(maxsize=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL + CHAT_CACHE_STALE_TTL)
+_inflight = {}
+
+async def _fetch(bot, chat_id):
+    chat = await bot.get_chat(chat_id)
+    info = ChatInfo(chat.id, chat.title, chat.invite_link, chat.members_count)
+    chat_cache.set(chat_id, (info, time.monotonic()))
+    return info
+
+def _fetch_once(bot, chat_id):
+    """Share one get_chat call between concurrent lookups of the same chat"""
+    task = _inflight.get(chat_id)
+    if task is None:
+        task = asyncio.ensure_future(_fetch(bot, chat_id))
+        _inflight[chat_id] = task
+        task.add_done_callback(lambda _: _inflight.pop(chat_id, None))
+    return task
+
+def _log_refresh_error(task):
+    if not task.cancelled() and task.exception():
+        logger.warning(f"Chat refresh error: {task.exception()}")
+
+async def get_chat_info(bot, chat_id):
+    """Title, invite link and member count of a chat, cached"""
+    entry = chat_cache.get(chat_id)
+    if entry:
+        info, fetched_at = entry
+        if time.monotonic() - fetched_at > CHAT_CACHE_TTL and chat_id not in _inflight:
+            # Serve the stale copy and refresh in the background
+            _fetch_once(bot, chat_id).add_done_callback(_log_refresh_error)
+        return info
+    return await asyncio.shield(_fetch_once(bot, chat_id))
+
+async def get_chats_info(bot, chat_ids):
+    """Resolve many chats concurrently, None for the ones that fail"""
+    semaphore = asyncio.Semaphore(CHAT_RESOLVE_CONCURRENCY)
+
+    async def resolve(chat_id):
+        async with semaphore:
+            try:
+                return await get_chat_info(bot, chat_id)
+            except Exception as e:
+                logger.warning(f"Resolve chat {chat_id} error: {e}")
+                return None
+
+    results = await asyncio.gather(*(resolve(chat_id) for chat_id in chat_ids))
+    return dict(zip(chat_ids, results))
+
+def remember_invite_link(chat_id, invite_link):
+    """Keep a link created after the chat was cached"""
+    entry = chat_cache.peek(chat_id)
+    if entry:
+        info, fetched_at = entry
+        chat_cache.set(chat_id, (info._replace(invite_link=invite_link), fetched_at))
+
+@cluster.on("chat")
+def _forget_chat(chat_id):
+    chat_cache.pop(chat_id)
+
+def forget_chat(chat_id):
+    """Drop a chat's cached info here and in every other worker"""
+    _forget_chat(chat_id)
+    cluster.publish("chat", chat_id)
+
+async def leave_chat(bot, chat_id):
+    forget_chat(chat_id)
+    return await bot.leave_chat(chat_id)
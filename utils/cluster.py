@@ -0,0 +1,348 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+from datetime import datetime, timedelta
+from io import BytesIO
+import pyrogram
+from pyrogram import raw, utils
+from pyrogram.dispatcher import Dispatcher
+from pyrogram.raw.core import TLObject
+from info import WORKER_LANES, HEARTBEAT_INTERVAL, WORKER_STALE_AFTER
+from utils.db import workers_col
+
+logger = logging.getLogger(__name__)
+
+# Receiver.attach and the worker lanes reach into Dispatcher internals,
+# checked against this release only
+PYROGRAM_VERSION = "2.0.106"
+
+def _check_pyrogram(what):
+    if pyrogram.__version__ != PYROGRAM_VERSION:
+        raise RuntimeError(
+            f"{what} relies on pyrogram {PYROGRAM_VERSION} internals, found {pyrogram.__version__}. "
+            f"Check it against the new Dispatcher or run with WORKERS=0"
+        )
+
+# Joins and leaves go to every worker, each keeps its own force sub cache
+BROADCAST_UPDATES = (raw.types.UpdateChannelParticipant, raw.types.UpdateChatParticipant)
+
+def partition(chat_id, workers):
+    return chat_id % workers
+
+def update_chat_id(update):
+    """Chat a raw update belongs to, 0 for updates without one"""
+    peer = getattr(getattr(update, "message", None), "peer_id", None) or getattr(update, "peer", None)
+    if peer is not None:
+        return utils.get_peer_id(peer)
+    if getattr(update, "channel_id", None):
+        return utils.get_channel_id(update.channel_id)
+    if getattr(update, "chat_id", None):
+        return -update.chat_id
+    return 0
+
+def pack(update, users, chats):
+    """Serialize a raw update the way MTProto does, for another process"""
+    return (
+        update.write(),
+        [user.write() for user in users.values()],
+        [chat.write() for chat in chats.values()]
+    )
+
+def unpack(packet):
+    update, users, chats = packet
+    users = [TLObject.read(BytesIO(data)) for data in users]
+    chats = [TLObject.read(BytesIO(data)) for data in chats]
+    return TLObject.read(BytesIO(update)), {u.id: u for u in users}, {c.id: c for c in chats}
+
+class Cluster:
+    """Which worker this process is, and cache events shared between workers
+
+    Modules holding per-process state register handlers with on(kind)
+    and call publish(kind, ...) after a local change. The receiver relays
+    events to every other worker. In a single process both are no-ops.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.workers = 0
+        self._events = None
+        self._handlers = {}
+
+    @property
+    def primary(self):
+        """Runs the jobs only one process may run, like the user session"""
+        return self.index in (None, 0)
+
+    def join(self, index, workers, events):
+        self.index = index
+        self.workers = workers
+        self._events = events
+
+    def owns(self, chat_id):
+        return self.index is None or partition(chat_id, self.workers) == self.index
+
+    def on(self, kind):
+        def decorator(func):
+            self._handlers.setdefault(kind, []).append(func)
+            return func
+        return decorator
+
+    def publish(self, kind, *args):
+        if self._events is not None:
+            self._events.put((self.index, kind, args))
+
+    def apply(self, kind, args):
+        for func in self._handlers.get(kind, []):
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"Cluster event {kind} error: {e}")
+
+cluster = Cluster()
+
+async def _get(q):
+    """Wait for a multiprocessing queue without blocking the loop for good"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            return await loop.run_in_executor(None, q.get, True, 1)
+        except queue.Empty:
+            continue
+
+class _Forwarder:
+    """Takes the place of the receiver's dispatcher queue
+
+    Client.handle_updates puts every raw update here, they are sent to
+    a worker instead of being parsed and handled. get() only ever returns
+    the None that Dispatcher.stop() puts for each of its tasks.
+    """
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+        self._stopped = asyncio.Queue()
+
+    def put_nowait(self, packet):
+        if packet is None:
+            self._stopped.put_nowait(None)
+        else:
+            self.receiver.forward(*packet)
+
+    async def get(self):
+        return await self._stopped.get()
+
+    def qsize(self):
+        return 0
+
+class Receiver:
+    """Pulls updates with the bot session and fans them out to worker processes"""
+
+    def __init__(self, bot, workers, target):
+        self.bot = bot
+        self.workers = workers
+        self.target = target
+        self.dispatched = [0] * workers
+        self.restarts = [0] * workers
+        self._ctx = multiprocessing.get_context("spawn")
+        self.inboxes = [self._ctx.Queue() for _ in range(workers)]
+        self.events = self._ctx.Queue()
+        self.processes = [None] * workers
+        self._tasks = []
+
+    def attach(self):
+        """Route the bot's updates to the workers, call before bot.start()
+
+        Tied to pyrogram 2.0.106: Client.handle_updates puts every update
+        on dispatcher.updates_queue and the handler tasks get() from it,
+        so swapping the queue reroutes them. Plugins are not loaded here,
+        the workers run them.
+        """
+        _check_pyrogram("Receiver.attach")
+        if self.bot.is_connected:
+            raise RuntimeError("Receiver.attach must run before bot.start()")
+        self.bot.plugins = None
+        self.bot.dispatcher.updates_queue = _Forwarder(self)
+
+    def forward(self, update, users, chats):
+        try:
+            packet = pack(update, users, chats)
+        except Exception as e:
+            logger.error(f"Pack {type(update).__name__} error: {e}")
+            return
+        if isinstance(update, BROADCAST_UPDATES):
+            targets = range(self.workers)
+        else:
+            targets = (partition(update_chat_id(update), self.workers),)
+        for index in targets:
+            self.inboxes[index].put(("update", packet))
+            self.dispatched[index] += 1
+
+    def _spawn(self, index):
+        process = self._ctx.Process(
+            target=self.target,
+            args=(index, self.workers, self.inboxes[index], self.events),
+            name=f"worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info(f"Worker {index} started, pid {process.pid}")
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+        self._tasks = [asyncio.create_task(self._relay()), asyncio.create_task(self._monitor())]
+
+    async def _relay(self):
+        while True:
+            origin, kind, args = await _get(self.events)
+            for index, inbox in enumerate(self.inboxes):
+                if index != origin:
+                    inbox.put(("event", kind, args))
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await self._check()
+            except Exception as e:
+                logger.error(f"Worker monitor error: {e}")
+
+    async def _check(self):
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=WORKER_STALE_AFTER)
+        async for doc in workers_col.find({"index": {"$lt": self.workers}, "last_seen": {"$lt": stale}}):
+            process = self.processes[doc["index"]]
+            if process.is_alive() and process.pid == doc.get("pid"):
+                # Alive but its loop is stuck, the restart below takes over
+                logger.error(f"Worker {doc['index']} silent for {WORKER_STALE_AFTER}s, killing it")
+                process.kill()
+                process.join(5)
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                logger.error(f"Worker {index} exited with {process.exitcode}, restarting")
+                self.restarts[index] += 1
+                self._spawn(index)
+        await workers_col.update_one(
+            {"_id": "receiver"},
+            {"$set": {
+                "pid": os.getpid(),
+                "host": socket.gethostname(),
+                "last_seen": now,
+                "workers": self.workers,
+                "dispatched": self.dispatched,
+                "restarts": self.restarts
+            }},
+            upsert=True
+        )
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for inbox in self.inboxes:
+            inbox.put(("stop",))
+        for process in self.processes:
+            process.join(30)
+            if process.is_alive():
+                process.terminate()
+
+class _Lane(Dispatcher):
+    """A handler task with its own queue, on the client's registered handlers
+
+    Runs the stock Dispatcher.handler_worker. groups is read from the
+    client's dispatcher on every update, since add_handler replaces it.
+    """
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.updates_queue = asyncio.Queue()
+
+    @property
+    def groups(self):
+        return self.client.dispatcher.groups
+
+    @groups.setter
+    def groups(self, value):
+        # Dispatcher.__init__ sets an empty one of its own, unused
+        pass
+
+class Worker:
+    """Feeds updates from the receiver into this process' plugins
+
+    Updates go through WORKER_LANES lanes by chat, each a pyrogram
+    handler worker with its own queue, so one chat's updates are handled
+    in the order they arrived while other chats run alongside. Their
+    locks sit in the client dispatcher's locks_list, so add_handler and
+    remove_handler wait for running handlers as they do in one process.
+    """
+
+    def __init__(self, client, inbox):
+        self.client = client
+        self.inbox = inbox
+        self.received = 0
+        self.started_at = datetime.utcnow()
+        self.lanes = []
+        self._tasks = []
+
+    async def run(self):
+        _check_pyrogram("Worker lanes")
+        locks_list = self.client.dispatcher.locks_list
+        self.lanes = [_Lane(self.client) for _ in range(WORKER_LANES)]
+        locks = [asyncio.Lock() for _ in self.lanes]
+        locks_list.extend(locks)
+        self._tasks = [
+            asyncio.create_task(lane.handler_worker(lock))
+            for lane, lock in zip(self.lanes, locks)
+        ]
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await self._feed()
+        finally:
+            heartbeat.cancel()
+            for lane in self.lanes:
+                lane.updates_queue.put_nowait(None)
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            for lock in locks:
+                locks_list.remove(lock)
+
+    async def _feed(self):
+        while True:
+            message = await _get(self.inbox)
+            if message[0] == "stop":
+                return
+            if message[0] == "event":
+                cluster.apply(message[1], message[2])
+                continue
+            try:
+                update, users, chats = unpack(message[1])
+                # Access hashes, so replies to these chats resolve locally
+                await self.client.fetch_peers(list(users.values()) + list(chats.values()))
+            except Exception as e:
+                logger.error(f"Unpack update error: {e}")
+                continue
+            # Chats in this worker share chat_id % workers, spread them by the rest
+            lane = self.lanes[(update_chat_id(update) // max(cluster.workers, 1)) % len(self.lanes)]
+            lane.updates_queue.put_nowait((update, users, chats))
+            self.received += 1
+
+    async def _heartbeat(self):
+        while True:
+            try:
+                await workers_col.update_one(
+                    {"_id": f"worker-{cluster.index}"},
+                    {"$set": {
+                        "index": cluster.index,
+                        "pid": os.getpid(),
+                        "host": socket.gethostname(),
+                        "started_at": self.started_at,
+                        "last_seen": datetime.utcnow(),
+                        "received": self.received,
+                        "pending": sum(lane.updates_queue.qsize() for lane in self.lanes)
+                    }},
+                    upsert=True
+                )
+            except Exception as e:
+                logger.error(f"Heartbeat error: {e}")
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from utils.db import users_col, groups_col
+
+logger = logging.getLogger(__name__)
+
+class Counters:
+    """Running totals for /stats, kept up to date by the write helpers
+
+    reconcile() resets them from Mongo now and then, so drift from
+    writes made elsewhere does not build up.
+    """
+
+    def __init__(self):
+        self.users = 0
+        self.groups = 0
+        self.verified_groups = 0
+        self.channels = 0
+        self.reconciled = False
+        self._task = None
+
+    def group_changed(self, old, new):
+        """Apply the difference between two versions of a group document"""
+        if old is None and new is not None:
+            self.groups += 1
+        elif old is not None and new is None:
+            self.groups -= 1
+        self.verified_groups += bool((new or {}).get("verified")) - bool((old or {}).get("verified"))
+        self.channels += len((new or {}).get("channels") or []) - len((old or {}).get("channels") or [])
+
+    def users_flushed(self, result):
+        self.users += result.upserted_count
+
+    def users_deleted(self, count):
+        self.users -= count
+
+    async def reconcile(self):
+        try:
+            users, groups, verified, channels = await asyncio.gather(
+                users_col.estimated_document_count(),
+                groups_col.estimated_document_count(),
+                groups_col.count_documents({"verified": True}),
+                groups_col.aggregate([
+                    {"$group": {"_id": None, "total": {"$sum": {"$size": {"$ifNull": ["$channels", []]}}}}}
+                ]).to_list(1)
+            )
+            self.users = users
+            self.groups = groups
+            self.verified_groups = verified
+            self.channels = channels[0]["total"] if channels else 0
+            self.reconciled = True
+        except Exception as e:
+            logger.error(f"Reconcile counters error: {e}")
+
+    async def _loop(self, interval):
+        while True:
+            await self.reconcile()
+            await asyncio.sleep(interval)
+
+    def start(self, interval):
+        if not self._task:
+            self._task = asyncio.create_task(self._loop(interval))
+
+    def snapshot(self):
+        return {
+            "users": self.users,
+            "groups": self.groups,
+            "verified_groups": self.verified_groups,
+            "channels": self.channels
+        }
+
+counters = Counters()
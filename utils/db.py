@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from info import (
+    DATABASE_URI, DATABASE_NAME, DB_MAX_POOL_SIZE, DB_MIN_POOL_SIZE,
+    DB_CONNECT_TIMEOUT_MS, DB_SOCKET_TIMEOUT_MS, DB_SERVER_SELECTION_TIMEOUT_MS,
+    DB_READ_PREFERENCE, DB_WRITE_CONCERN
+)
+from utils.metrics import MongoListener
+
+logger = logging.getLogger(__name__)
+
+# The one connection pool every module shares
+db_client = AsyncIOMotorClient(
+    DATABASE_URI,
+    maxPoolSize=DB_MAX_POOL_SIZE,
+    minPoolSize=DB_MIN_POOL_SIZE,
+    connectTimeoutMS=DB_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=DB_SOCKET_TIMEOUT_MS,
+    serverSelectionTimeoutMS=DB_SERVER_SELECTION_TIMEOUT_MS,
+    readPreference=DB_READ_PREFERENCE,
+    w=int(DB_WRITE_CONCERN) if DB_WRITE_CONCERN.isdigit() else DB_WRITE_CONCERN,
+    event_listeners=[MongoListener()]
+)
+db = db_client[DATABASE_NAME]
+
+groups_col = db["Groups"]
+users_col = db["Users"]
+pending_col = db["PendingRequests"]
+posts_col = db["Posts"]
+broadcasts_col = db["Broadcasts"]
+deletes_col = db["ScheduledDeletes"]
+workers_col = db["Workers"]
+backfills_col = db["Backfills"]
+
+# Collection -> indexes ensured at startup
+INDEXES = {
+    groups_col: [
+        IndexModel([("channels", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("verified", ASCENDING)])
+    ],
+    users_col: [
+        IndexModel([("last_seen", DESCENDING)])
+    ],
+    pending_col: [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel([("timestamp", ASCENDING)], expireAfterSeconds=86400)
+    ],
+    posts_col: [
+        # Same spec as the index existing deployments already have, a
+        # collection can only have one text index
+        IndexModel([("text", TEXT)]),
+        IndexModel([("channel_id", ASCENDING), ("message_id", ASCENDING)], unique=True)
+    ],
+    broadcasts_col: [
+        IndexModel([("status", ASCENDING)])
+    ],
+    backfills_col: [
+        IndexModel([("status", ASCENDING), ("queued_at", ASCENDING)])
+    ]
+}
+
+async def _ensure(col, indexes):
+    try:
+        await col.create_indexes(indexes)
+    except Exception as e:
+        logger.error(f"Index error on {col.name}: {e}")
+
+async def ensure_indexes():
+    await asyncio.gather(*(_ensure(col, indexes) for col, indexes in INDEXES.items()))
+    logger.info("Database indexes created")
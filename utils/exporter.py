@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import os
+from info import METRICS_FILE, METRICS_INTERVAL
+from utils.metrics import Gauge, render
+from utils.helpers import group_cache, user_buffer
+from utils.chats import chat_cache
+from utils.search import result_cache
+from utils.prefilter import prefilter
+from utils.scheduler import delete_scheduler
+from utils.cluster import cluster
+from plugins.fsub import membership_cache
+from plugins.search import search_flights, search_limiter
+
+logger = logging.getLogger(__name__)
+
+CACHES = {
+    "group": group_cache,
+    "fsub_membership": membership_cache,
+    "chat": chat_cache,
+    "search_result": result_cache.cache,
+    "search_page": result_cache.pages
+}
+
+def _cache_stat(field):
+    return lambda: {(name,): cache.stats()[field] for name, cache in CACHES.items()}
+
+Gauge("rmc_cache_hits", "Cache hits", _cache_stat("hits"), ("cache",))
+Gauge("rmc_cache_misses", "Cache misses", _cache_stat("misses"), ("cache",))
+Gauge("rmc_cache_hit_ratio", "Cache hit ratio", _cache_stat("hit_ratio"), ("cache",))
+Gauge("rmc_cache_entries", "Cache entries", _cache_stat("size"), ("cache",))
+Gauge("rmc_cache_bytes", "Estimated cache size", lambda: result_cache.cache.bytes)
+Gauge(
+    "rmc_prefilter_messages", "Group messages by prefilter verdict",
+    lambda: {("passed",): prefilter.passed, **{(reason,): n for reason, n in prefilter.dropped.items()}},
+    ("verdict",)
+)
+Gauge(
+    "rmc_search_throttled", "Searches dropped by the rate limiter",
+    lambda: {("user",): search_limiter.throttled_users, ("group",): search_limiter.throttled_groups},
+    ("scope",)
+)
+Gauge("rmc_search_coalesced", "Searches that joined an in-flight call", lambda: search_flights.shared)
+Gauge("rmc_delete_queue_depth", "Messages waiting for auto delete", lambda: delete_scheduler.depth)
+Gauge("rmc_user_buffer_pending", "User writes waiting for a flush", lambda: len(user_buffer))
+
+def write_metrics():
+    """Atomically replace the metrics file served by app.py
+
+    Workers each write their own file, labelled with their index.
+    """
+    if cluster.index is None:
+        path, labels = METRICS_FILE, None
+    else:
+        path, labels = f"{METRICS_FILE}.worker{cluster.index}", {"worker": cluster.index}
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render(labels))
+    os.replace(tmp, path)
+
+async def export_metrics():
+    while True:
+        try:
+            write_metrics()
+        except Exception as e:
+            logger.error(f"Metrics export error: {e}")
+        await asyncio.sleep(METRICS_INTERVAL)
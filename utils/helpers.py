@@ -1,24 +1,45 @@
-import asyncio
+import copy
 import logging
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
-from info import DATABASE_URI
+from pymongo import ReturnDocument
+from info import GROUP_CACHE_SIZE, GROUP_CACHE_TTL, STREAM_BATCH_SIZE, USER_FLUSH_INTERVAL, USER_FLUSH_MAX
+from utils.cache import TTLCache
+from utils.writebehind import UserWriteBuffer
+from utils.db import groups_col, users_col, pending_col, ensure_indexes
+from utils.counters import counters
+from utils.cluster import cluster
 
 logger = logging.getLogger(__name__)
 
-db_client = AsyncIOMotorClient(DATABASE_URI)
-db = db_client["ChannelFilter"]
-groups_col = db["Groups"]
-users_col = db["Users"]
-pending_col = db["PendingRequests"]
+# Group configs only change on /connect, /fsub, /verify etc.
+group_cache = TTLCache(maxsize=GROUP_CACHE_SIZE, ttl=GROUP_CACHE_TTL)
+_NOT_CACHED = object()
+# Force sub channels whose member updates keep plugins.fsub's membership
+# cache fresh, seeded by preload_groups so it holds from the first update
+fsub_channels = set()
+
+# User upserts and activity are written in bulk, see UserWriteBuffer
+user_buffer = UserWriteBuffer(users_col, USER_FLUSH_INTERVAL, USER_FLUSH_MAX)
+user_buffer.on_flush.append(counters.users_flushed)
+
+# Only the fields the counters need from the previous version
+_COUNTED = {"verified": 1, "channels": 1}
+
+def _write_through(group_id, data):
+    cached = group_cache.peek(group_id)
+    if cached is not None:
+        cached.update(copy.deepcopy(data))
+    else:
+        group_cache.pop(group_id)
+    cluster.publish("group", group_id)
+
+@cluster.on("group")
+def _forget_group(group_id):
+    # Changed by another worker, reread on next use
+    group_cache.pop(group_id)
 
 async def create_indexes():
-    try:
-        await pending_col.create_index("user_id", unique=True)
-        await pending_col.create_index("timestamp", expireAfterSeconds=86400)
-        logger.info("Database indexes created")
-    except Exception as e:
-        logger.error(f"Index error: {e}")
+    await ensure_indexes()
 
 async def add_group(group_id, group_name, user_name, user_id, channels, f_sub, verified):
     data = {
@@ -33,15 +54,27 @@ async def add_group(group_id, group_name, user_name, user_id, channels, f_sub, v
         "last_updated": datetime.utcnow()
     }
     try:
-        await groups_col.update_one({"_id": group_id}, {"$set": data}, upsert=True)
+        old = await groups_col.find_one_and_update(
+            {"_id": group_id}, {"$set": data}, projection=_COUNTED,
+            upsert=True, return_document=ReturnDocument.BEFORE
+        )
+        counters.group_changed(old, {**(old or {}), **data})
+        _write_through(group_id, data)
         return True
     except Exception as e:
+        group_cache.pop(group_id)
         logger.error(f"Add group error: {e}")
         return False
 
 async def get_group(group_id):
+    cached = group_cache.get(group_id, _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        # Callers mutate the returned document, never hand out the cached one
+        return copy.deepcopy(cached)
     try:
-        return await groups_col.find_one({"_id": group_id})
+        group = await groups_col.find_one({"_id": group_id})
+        group_cache.set(group_id, group)
+        return copy.deepcopy(group)
     except Exception as e:
         logger.error(f"Get group error: {e}")
         return None
@@ -53,28 +86,119 @@ async def get_groups():
         logger.error(f"Get groups error: {e}")
         return []
 
+async def delete_group(group_id):
+    try:
+        old = await groups_col.find_one_and_delete({"_id": group_id}, projection=_COUNTED)
+        if old is not None:
+            counters.group_changed(old, None)
+        group_cache.pop(group_id)
+        cluster.publish("group", group_id)
+        return old is not None
+    except Exception as e:
+        logger.error(f"Delete group error: {e}")
+        return False
+
+async def is_channel_connected(channel_id, strict=False):
+    """Whether any group uses the channel, strict raises when the lookup fails instead of saying no"""
+    try:
+        return await groups_col.find_one({"channels": channel_id}, {"_id": 1}) is not None
+    except Exception as e:
+        if strict:
+            raise
+        logger.error(f"Channel lookup error: {e}")
+        return False
+
+async def iter_collection(col, query=None, projection=None, batch_size=STREAM_BATCH_SIZE, id_range=None):
+    """Stream documents in _id order without loading the collection
+
+    id_range is a (low, high) pair from id_ranges(), either end may be
+    None, so several workers can each walk one slice.
+    """
+    query = dict(query or {})
+    if id_range:
+        low, high = id_range
+        bounds = dict(query.get("_id") or {})
+        if low is not None:
+            bounds["$gte"] = low
+        if high is not None:
+            bounds["$lt"] = high
+        if bounds:
+            query["_id"] = bounds
+    try:
+        cursor = col.find(query, projection).sort("_id", 1).batch_size(batch_size)
+        async for doc in cursor:
+            yield doc
+    except Exception as e:
+        # A silently truncated walk would look like a finished one
+        logger.error(f"Stream {col.name} error: {e}")
+        raise
+
+async def id_ranges(col, shards):
+    """Split a collection into about equally sized _id ranges"""
+    try:
+        buckets = await col.aggregate(
+            [{"$bucketAuto": {"groupBy": "$_id", "buckets": shards}}],
+            allowDiskUse=True
+        ).to_list(None)
+    except Exception as e:
+        logger.error(f"Shard {col.name} error: {e}")
+        return [(None, None)]
+    if not buckets:
+        return [(None, None)]
+    bounds = [None] + [bucket["_id"]["min"] for bucket in buckets[1:]] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def iter_users(query=None, projection=None, batch_size=STREAM_BATCH_SIZE, id_range=None):
+    return iter_collection(users_col, query, projection, batch_size, id_range)
+
+def iter_groups(query=None, projection=None, batch_size=STREAM_BATCH_SIZE, id_range=None):
+    return iter_collection(groups_col, query, projection, batch_size, id_range)
+
+async def preload_groups(owns=None):
+    """Warm the group cache with verified groups, those owns(group_id) accepts if given
+
+    Also fills fsub_channels from every one of them, past the cache size.
+    """
+    loaded = 0
+    try:
+        async for group in iter_groups({"verified": True}):
+            if owns and not owns(group["_id"]):
+                continue
+            if group.get("f_sub"):
+                fsub_channels.add(group["f_sub"])
+            if loaded < group_cache.maxsize:
+                group_cache.set(group["_id"], group)
+                loaded += 1
+    except Exception as e:
+        logger.error(f"Preload groups error: {e}")
+    return loaded
+
 async def update_group(group_id, new_data):
     try:
         new_data["last_updated"] = datetime.utcnow()
-        result = await groups_col.update_one({"_id": group_id}, {"$set": new_data})
-        return result.modified_count > 0
+        old = await groups_col.find_one_and_update(
+            {"_id": group_id}, {"$set": new_data},
+            projection={**_COUNTED, **dict.fromkeys(new_data, 1)},
+            return_document=ReturnDocument.BEFORE
+        )
+        _write_through(group_id, new_data)
+        if old is None:
+            return False
+        counters.group_changed(old, {**old, **new_data})
+        # Modified, like update_one's modified_count, not merely found
+        return any(key not in old or old[key] != value for key, value in new_data.items())
     except Exception as e:
+        group_cache.pop(group_id)
         logger.error(f"Update group error: {e}")
         return False
 
 async def add_user(user_id, user_name):
-    data = {
-        "_id": user_id,
-        "name": user_name,
-        "joined_at": datetime.utcnow(),
-        "last_seen": datetime.utcnow()
-    }
-    try:
-        await users_col.update_one({"_id": user_id}, {"$set": data}, upsert=True)
-        return True
-    except Exception as e:
-        logger.error(f"Add user error: {e}")
-        return False
+    user_buffer.add(user_id, user_name)
+    return True
+
+def touch_user(user_id):
+    """Record activity of an existing user without a write per message"""
+    user_buffer.touch(user_id)
 
 async def get_users():
     try:
@@ -83,19 +207,20 @@ async def get_users():
         logger.error(f"Get users error: {e}")
         return []
 
-async def total_users_count():
+async def delete_users(user_ids):
     try:
-        return await users_col.count_documents({})
+        result = await users_col.delete_many({"_id": {"$in": user_ids}})
+        counters.users_deleted(result.deleted_count)
+        return True
     except Exception as e:
-        logger.error(f"Count users error: {e}")
-        return 0
+        logger.error(f"Delete users error: {e}")
+        return False
+
+async def total_users_count():
+    return counters.users
 
 async def total_chat_count():
-    try:
-        return await groups_col.count_documents({})
-    except Exception as e:
-        logger.error(f"Count groups error: {e}")
-        return 0
+    return counters.groups
 
 async def save_pending_request(user_id, chat_id, query):
     try:
@@ -124,9 +249,8 @@ async def delete_pending_request(user_id):
         logger.error(f"Delete pending error: {e}")
         return False
 
-async def delete_after_delay(message, delay):
-    await asyncio.sleep(delay)
-    try:
-        await message.delete()
-    except:
-        pass
+def post_link(channel_id, message_id, username=None):
+    if username:
+        return f"https://t.me/{username}/{message_id}"
+    # Private channel links drop the -100 prefix
+    return f"https://t.me/c/{str(channel_id).replace('-100', '', 1)}/{message_id}"
@@ -0,0 +1,280 @@
+import functools
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from pymongo import monitoring
+from pyrogram import Client
+from pyrogram.errors import FloodWait
+from info import PERF_WINDOW, PERF_RECENT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Mongo command events arrive on driver threads
+_lock = threading.Lock()
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values = {}
+        registry.append(self)
+
+    def observe(self, value, *labels):
+        with _lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # One slot per bucket, then +Inf, then the sum
+                counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with _lock:
+            for labels, counts in self._values.items():
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {counts[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {counts[-2]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {counts[-1]}")
+        return lines
+
+class Gauge:
+    """Value read from a callback when metrics are rendered
+
+    The callback returns a number, or a dict of label tuple -> number.
+    """
+
+    def __init__(self, name, help, callback, labelnames=()):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labelnames = labelnames
+        registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning(f"Gauge {self.name} error: {e}")
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+registry = []
+
+def _with_labels(line, extra):
+    name, _, rest = line.partition("{")
+    if rest:
+        return f"{name}{{{extra},{rest}"
+    name, _, value = line.partition(" ")
+    return f"{name}{{{extra}}} {value}"
+
+def render(labels=None):
+    """Text exposition of every metric, labels are added to each sample"""
+    extra = ",".join(f'{name}="{value}"' for name, value in (labels or {}).items())
+    lines = []
+    for metric in registry:
+        for line in metric.render():
+            lines.append(_with_labels(line, extra) if extra and not line.startswith("#") else line)
+    return "\n".join(lines) + "\n"
+
+handler_duration = Histogram(
+    "rmc_handler_duration_seconds", "Handler wall time", ("handler",)
+)
+handler_busy = Histogram(
+    "rmc_handler_busy_seconds", "Handler time spent running, not awaiting", ("handler",)
+)
+handler_errors = Counter(
+    "rmc_handler_errors_total", "Handlers that raised", ("handler",)
+)
+telegram_calls = Counter(
+    "rmc_telegram_calls_total", "Telegram API calls", ("client", "method")
+)
+telegram_floodwaits = Counter(
+    "rmc_telegram_floodwait_total", "FloodWait errors", ("client", "method")
+)
+telegram_floodwait_seconds = Counter(
+    "rmc_telegram_floodwait_seconds_total", "Seconds Telegram asked us to wait", ("client",)
+)
+mongo_duration = Histogram(
+    "rmc_mongo_command_duration_seconds", "Mongo command latency", ("command",)
+)
+mongo_failures = Counter(
+    "rmc_mongo_command_failures_total", "Failed Mongo commands", ("command",)
+)
+search_outcomes = Counter(
+    "rmc_search_total", "Searches by where the answer came from", ("source",)
+)
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class HandlerProfile:
+    """Rolling per-handler timings and the most recent invocations, for /perf"""
+
+    def __init__(self, window, recent):
+        self.window = window
+        self._samples = {}
+        self._calls = {}
+        self._errors = {}
+        # (wall, handler, query, started) of the latest invocations
+        self.recent = deque(maxlen=recent)
+
+    def record(self, name, wall, busy, query, failed):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append((wall, busy))
+        self._calls[name] = self._calls.get(name, 0) + 1
+        if failed:
+            self._errors[name] = self._errors.get(name, 0) + 1
+        self.recent.append((wall, name, query, time.time()))
+
+    def table(self):
+        """handler -> calls, errors, wall p50/p95/p99 and mean awaited time"""
+        rows = {}
+        for name, samples in self._samples.items():
+            walls = sorted(wall for wall, _ in samples)
+            awaited = sum(wall - busy for wall, busy in samples) / len(samples)
+            rows[name] = {
+                "calls": self._calls[name],
+                "errors": self._errors.get(name, 0),
+                "p50": _percentile(walls, 0.50),
+                "p95": _percentile(walls, 0.95),
+                "p99": _percentile(walls, 0.99),
+                "awaited": awaited
+            }
+        return rows
+
+    def slowest(self, count=5):
+        return heapq.nlargest(count, self.recent, key=lambda entry: entry[0])
+
+profile = HandlerProfile(PERF_WINDOW, PERF_RECENT)
+
+class _Timed:
+    """Drive a coroutine step by step, adding up the time spent inside it
+
+    Whatever is left of the wall time was spent awaiting I/O or waiting
+    for the event loop to come back to us.
+    """
+
+    def __init__(self, coro):
+        self.coro = coro
+        self.busy = 0.0
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            start = time.perf_counter()
+            try:
+                if error is None:
+                    yielded = self.coro.send(value)
+                else:
+                    yielded = self.coro.throw(error)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.busy += time.perf_counter() - start
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+def _query_text(update):
+    text = getattr(update, "text", None) or getattr(update, "data", None)
+    if not isinstance(text, str):
+        return ""
+    return text[:64]
+
+def track(name):
+    """Record latency, awaited time and errors of a plugin handler under `name`"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            timed = _Timed(func(*args, **kwargs))
+            failed = False
+            start = time.perf_counter()
+            try:
+                return await timed
+            except Exception:
+                failed = True
+                handler_errors.inc(name)
+                raise
+            finally:
+                wall = time.perf_counter() - start
+                handler_duration.observe(wall, name)
+                handler_busy.observe(timed.busy, name)
+                update = args[1] if len(args) > 1 else None
+                profile.record(name, wall, timed.busy, _query_text(update), failed)
+        return wrapper
+    return decorator
+
+class MeteredClient(Client):
+    """pyrogram Client counting every API call and FloodWait"""
+
+    def __init__(self, *args, metrics_label="bot", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics_label = metrics_label
+
+    async def invoke(self, query, *args, **kwargs):
+        method = type(query).__name__
+        telegram_calls.inc(self.metrics_label, method)
+        try:
+            return await super().invoke(query, *args, **kwargs)
+        except FloodWait as e:
+            telegram_floodwaits.inc(self.metrics_label, method)
+            telegram_floodwait_seconds.inc(self.metrics_label, amount=e.value)
+            raise
+
+class MongoListener(monitoring.CommandListener):
+    """pymongo command listener feeding the Mongo metrics"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_duration.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        mongo_duration.observe(event.duration_micros / 1e6, event.command_name)
+        mongo_failures.inc(event.command_name)
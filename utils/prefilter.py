@@ -0,0 +1,72 @@
+import re
+from collections import Counter
+from info import (
+    PREFILTER_MIN_LENGTH, PREFILTER_MAX_LENGTH, PREFILTER_MAX_WORDS, PREFILTER_STOPWORDS
+)
+
+_URL = re.compile(r"(https?://|www\.|t\.me/|telegram\.me/)", re.IGNORECASE)
+_MENTION = re.compile(r"^[@#]\w+$")
+_REPEAT = re.compile(r"(.{1,3})\1{3,}")
+_WORD = re.compile(r"\w+")
+
+class Prefilter:
+    """Cheap checks telling search queries apart from ordinary chat
+
+    check() does no I/O and returns the reason a message was dropped, or
+    None if it looks like a search. Drops are counted per reason.
+    """
+
+    def __init__(self, min_length, max_length, max_words, stopwords):
+        self.min_length = min_length
+        self.max_length = max_length
+        self.max_words = max_words
+        self.stopwords = frozenset(stopwords)
+        self.passed = 0
+        self.dropped = Counter()
+
+    def _reason(self, text, group_stopwords):
+        text = text.strip()
+        if text.startswith("/"):
+            return "command"
+        if len(text) < self.min_length:
+            return "too_short"
+        if len(text) > self.max_length:
+            return "too_long"
+        if _URL.search(text):
+            return "link"
+        tokens = text.split()
+        if all(_MENTION.match(token) for token in tokens):
+            return "mention"
+        compact = text.replace(" ", "")
+        if compact.isdigit():
+            # Titles like 1917, 2012 or 300
+            return None if len(compact) >= 3 else "no_letters"
+        letters = sum(ch.isalpha() for ch in text)
+        if not letters:
+            # Emoji, punctuation
+            return "no_letters"
+        if letters < len(compact) / 2:
+            return "symbols"
+        if len(tokens) > self.max_words:
+            return "sentence"
+        if _REPEAT.search(text.lower()):
+            return "repeat"
+        words = [word.lower() for word in _WORD.findall(text)]
+        if all(word in self.stopwords or word in group_stopwords for word in words):
+            return "stopword"
+        return None
+
+    def check(self, text, group_stopwords=()):
+        reason = self._reason(text or "", group_stopwords)
+        if reason:
+            self.dropped[reason] += 1
+        else:
+            self.passed += 1
+        return reason
+
+    def stats(self):
+        return {"passed": self.passed, "dropped": sum(self.dropped.values()), **self.dropped}
+
+prefilter = Prefilter(
+    PREFILTER_MIN_LENGTH, PREFILTER_MAX_LENGTH, PREFILTER_MAX_WORDS, PREFILTER_STOPWORDS
+)
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+class TokenBucket:
+    """Async token bucket shared by every task drawing from one budget
+
+    pause() stops all takers, e.g. for the duration of a FloodWait.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        # Below one request per second a bucket of `rate` never holds a whole token
+        self.capacity = max(1.0, capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class SlidingWindow:
+    """Per-key limit of `limit` events in the last `window` seconds
+
+    Only the most recently used `maxkeys` keys are remembered.
+    """
+
+    def __init__(self, limit, window, maxkeys=100000):
+        self.limit = limit
+        self.window = window
+        self.maxkeys = maxkeys
+        self._events = OrderedDict()
+
+    def allowed(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        events = self._events.get(key)
+        if not events:
+            return True
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        return len(events) < self.limit
+
+    def record(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        events = self._events.get(key)
+        if events is None:
+            events = self._events[key] = deque()
+        events.append(now)
+        self._events.move_to_end(key)
+        while len(self._events) > self.maxkeys:
+            self._events.popitem(last=False)
+
+class SearchLimiter:
+    """Search quota per user and per group, with throttle counters"""
+
+    def __init__(self, user_limit, user_window, group_limit, group_window):
+        self.users = SlidingWindow(user_limit, user_window)
+        self.groups = SlidingWindow(group_limit, group_window)
+        self.allowed = 0
+        self.throttled_users = 0
+        self.throttled_groups = 0
+
+    def allow(self, chat_id, user_id):
+        now = time.monotonic()
+        if not self.users.allowed(user_id, now):
+            self.throttled_users += 1
+            return False
+        if not self.groups.allowed(chat_id, now):
+            self.throttled_groups += 1
+            return False
+        self.users.record(user_id, now)
+        self.groups.record(chat_id, now)
+        self.allowed += 1
+        return True
+
+    def stats(self):
+        return {
+            "allowed": self.allowed,
+            "throttled_users": self.throttled_users,
+            "throttled_groups": self.throttled_groups
+        }
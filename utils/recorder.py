@@ -0,0 +1,130 @@
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pyrogram import enums
+from info import ADMIN, BOT_TOKEN, RECORD_UPDATES, RECORD_SECRET
+
+logger = logging.getLogger(__name__)
+
+# Long numbers in text or callback data are chat, user or message ids
+_ID = re.compile(r"-?\d{5,}")
+# Entries kept in memory before they are handed to the writer thread
+FLUSH_EVERY = 1000
+
+class UpdateRecorder:
+    """Append incoming updates to a gzip JSON lines log for bench/replay.py
+
+    Ids are replaced by a keyed hash whose key comes from RECORD_SECRET
+    and is never written, so the same user or chat keeps one id across
+    workers and restarts without being traceable. ADMIN keeps its id so
+    admin commands still replay. Names are never recorded and private
+    messages only keep their /command.
+
+    Entries are buffered and written by one thread, gzip never blocks
+    the event loop.
+    """
+
+    def __init__(self, path, secret):
+        self.path = path
+        self.recorded = 0
+        self._key = hashlib.sha256(f"record:{secret}".encode()).digest()
+        self._started = time.monotonic()
+        self._file = None
+        self._buffer = []
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="Recorder")
+
+    def _anon(self, value):
+        value = int(value)
+        if value == ADMIN:
+            return value
+        digest = hmac.new(self._key, str(value).encode(), hashlib.sha256).digest()
+        number = int.from_bytes(digest[:8], "big")
+        if value < 0:
+            # -100 then a 31 bit id for supergroups and channels, as Telegram
+            # builds them, basic groups stay short
+            return -(10**12 + number % 2147483647) if value <= -10**12 else -(number % 1000000000)
+        return 100000000 + number % 7000000000
+
+    def _anon_text(self, text):
+        return _ID.sub(lambda m: str(self._anon(m.group())), text) if text else text
+
+    def _write(self, entry):
+        entry["t"] = round(time.monotonic() - self._started, 3)
+        self._buffer.append(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n")
+        self.recorded += 1
+        if len(self._buffer) >= FLUSH_EVERY:
+            self._flush()
+
+    def _flush(self):
+        """Hand the buffer to the writer thread, runs in order after earlier ones"""
+        lines, self._buffer = self._buffer, []
+        if lines:
+            return asyncio.get_running_loop().run_in_executor(self._writer, self._append, lines)
+
+    def _append(self, lines):
+        # Whatever was recorded survives a crash, up to the last flush
+        try:
+            if self._file is None:
+                self._file = gzip.open(self.path, "at", encoding="utf-8")
+                logger.info(f"Recording updates to {self.path}")
+            self._file.writelines(lines)
+            self._file.flush()
+        except Exception as e:
+            logger.error(f"Record update error: {e}")
+
+    def _chat(self, entry, chat):
+        entry["c"] = self._anon(chat.id)
+        entry["ct"] = chat.type.value
+
+    def message(self, message):
+        entry = {"k": "m"}
+        self._chat(entry, message.chat)
+        if message.from_user:
+            entry["u"] = self._anon(message.from_user.id)
+        text = message.text or message.caption
+        # Private replies can be phone numbers, login codes or passwords
+        if text and (message.chat.type != enums.ChatType.PRIVATE or text.startswith("/")):
+            entry["x"] = self._anon_text(str(text))
+        if message.new_chat_members:
+            entry["n"] = [self._anon(user.id) for user in message.new_chat_members]
+        self._write(entry)
+
+    def callback_query(self, query):
+        entry = {"k": "c", "u": self._anon(query.from_user.id), "d": self._anon_text(query.data)}
+        if query.message:
+            self._chat(entry, query.message.chat)
+        self._write(entry)
+
+    def chat_member(self, update):
+        entry = {"k": "u"}
+        self._chat(entry, update.chat)
+        for key, member in (("o", update.old_chat_member), ("n", update.new_chat_member)):
+            if member and member.user:
+                entry["u"] = self._anon(member.user.id)
+                entry[key] = member.status.value
+        self._write(entry)
+
+    def for_worker(self, index):
+        """Workers each append to their own file"""
+        self.path = f"{self.path}.worker{index}"
+
+    def _close_file(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    async def close(self):
+        pending = self._flush()
+        if pending:
+            await pending
+        await asyncio.get_running_loop().run_in_executor(self._writer, self._close_file)
+        logger.info(f"Recorded {self.recorded} updates")
+
+# Only set when RECORD_UPDATES names a file
+recorder = UpdateRecorder(RECORD_UPDATES, RECORD_SECRET or BOT_TOKEN) if RECORD_UPDATES else None
@@ -0,0 +1,133 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pyrogram.errors import FloodWait
+from info import DELETE_FLUSH_INTERVAL
+from utils.db import deletes_col
+
+logger = logging.getLogger(__name__)
+
+def _now():
+    # Due times are stored as naive UTC datetimes
+    return datetime.utcnow().timestamp()
+
+class DeleteScheduler:
+    """One timer heap for every pending message deletion
+
+    Due times are written to Mongo in batches so deletions survive a
+    restart, and due messages are deleted per chat in one call.
+    """
+
+    def __init__(self):
+        self.bot = None
+        self.deleted = 0
+        self._heap = []
+        self._unsaved = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+
+    @property
+    def depth(self):
+        return len(self._heap)
+
+    async def start(self, bot, owns=None):
+        """Load saved deletions, only of chats owns(chat_id) accepts if given"""
+        self.bot = bot
+        self._stopping = False
+        try:
+            async for doc in deletes_col.find({}):
+                if owns and not owns(doc["chat_id"]):
+                    continue
+                heapq.heappush(self._heap, (doc["due"].timestamp(), doc["chat_id"], doc["message_id"], doc["_id"]))
+            logger.info(f"Loaded {len(self._heap)} scheduled deletions")
+        except Exception as e:
+            logger.error(f"Load deletions error: {e}")
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Let the loop finish a write in flight, then save what is left
+
+        Cancelling it mid insert_many would lose the batch it took.
+        """
+        task, self._task = self._task, None
+        if task:
+            self._stopping = True
+            self._wakeup.set()
+            await task
+        await self._save()
+
+    def schedule(self, message, delay):
+        """Delete message after delay seconds"""
+        due = datetime.utcnow() + timedelta(seconds=delay)
+        doc = {"_id": ObjectId(), "chat_id": message.chat.id, "message_id": message.id, "due": due}
+        self._unsaved.append(doc)
+        item = (due.timestamp(), doc["chat_id"], doc["message_id"], doc["_id"])
+        heapq.heappush(self._heap, item)
+        if self._heap[0] is item or len(self._unsaved) == 1:
+            self._wakeup.set()
+
+    async def _save(self):
+        docs, self._unsaved = self._unsaved, []
+        if not docs:
+            return
+        try:
+            await deletes_col.insert_many(docs, ordered=False)
+        except Exception as e:
+            logger.error(f"Save deletions error: {e}")
+
+    async def _loop(self):
+        while not self._stopping:
+            try:
+                timeout = None
+                if self._heap:
+                    timeout = max(self._heap[0][0] - _now(), 0)
+                if self._unsaved:
+                    timeout = min(timeout if timeout is not None else DELETE_FLUSH_INTERVAL, DELETE_FLUSH_INTERVAL)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                await self._save()
+                await self._delete_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Delete scheduler error: {e}")
+                await asyncio.sleep(1)
+
+    async def _delete_due(self):
+        now = _now()
+        by_chat = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, chat_id, message_id, doc_id = heapq.heappop(self._heap)
+            by_chat.setdefault(chat_id, []).append((message_id, doc_id))
+
+        done = []
+        for chat_id, items in by_chat.items():
+            for i in range(0, len(items), 100):
+                chunk = items[i:i + 100]
+                try:
+                    await self.bot.delete_messages(chat_id, [message_id for message_id, _ in chunk])
+                except FloodWait as e:
+                    # Try again once the wait is over
+                    retry = _now() + e.value
+                    for message_id, doc_id in chunk:
+                        heapq.heappush(self._heap, (retry, chat_id, message_id, doc_id))
+                    continue
+                except Exception as e:
+                    # Already deleted, or bot removed from the chat
+                    logger.debug(f"Delete in {chat_id} failed: {e}")
+                self.deleted += len(chunk)
+                done.extend(doc_id for _, doc_id in chunk)
+
+        if done:
+            await deletes_col.delete_many({"_id": {"$in": done}})
+
+delete_scheduler = DeleteScheduler()
+
+def schedule_delete(message, delay):
+    delete_scheduler.schedule(message, delay)
@@ -31,7 +31,9 @@ class script(object):
     STATS = """<b>My Status 💫
 
 👥 Users: {}
-🧿 Groups: {}</b>"""
+🧿 Groups: {}
+✅ Verified Groups: {}
+📢 Connected Channels: {}</b>"""
 
     BROADCAST = """<u>{}</u>
 
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from collections import namedtuple
+from info import (
+    SEARCH_CONCURRENCY, SEARCH_CHANNEL_TIMEOUT, SEARCH_RESULTS_LIMIT,
+    RESULT_CACHE_SIZE, RESULT_CACHE_BYTES, RESULT_CACHE_TTL, SEARCH_PAGE_CACHE_TTL
+)
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SearchResult = namedtuple("SearchResult", ["posts", "timings"])
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize_query(query):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(_NON_WORD.sub(" ", query.lower()).split())
+
+def _posts_size(posts):
+    return 64 + sum(
+        64 + sum(len(str(value)) for value in post.values())
+        for post in posts
+    )
+
+class ResultCache:
+    """Search results keyed by normalized query and channel set
+
+    The first page goes in cache, later ones in pages. Entries of both
+    are dropped as soon as a post lands in any of their channels.
+    """
+
+    def __init__(self, maxsize, maxbytes, ttl, pages_maxsize, pages_ttl):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, maxbytes=maxbytes, sizeof=_posts_size)
+        # Pages after the first, fetched when someone taps next
+        self.pages = TTLCache(maxsize=pages_maxsize, ttl=pages_ttl)
+        self._by_channel = {}
+        self._refs = 0
+
+    @staticmethod
+    def key(query, channels):
+        channel_set = ",".join(str(channel) for channel in sorted(set(channels)))
+        return (normalize_query(query), hashlib.sha1(channel_set.encode()).hexdigest())
+
+    def get(self, query, channels, page=0):
+        if page:
+            return self.pages.get((self.key(query, channels), page))
+        return self.cache.get(self.key(query, channels))
+
+    def set(self, query, channels, posts, ttl=None, page=0):
+        key = self.key(query, channels)
+        # Only keep what rendering needs
+        posts = [{k: v for k, v in post.items() if k != "text"} for post in posts]
+        if page:
+            key = (key, page)
+            self.pages.set(key, posts, ttl=ttl)
+        else:
+            self.cache.set(key, posts, ttl=ttl)
+        for channel in channels:
+            keys = self._by_channel.setdefault(channel, set())
+            if key not in keys:
+                keys.add(key)
+                self._refs += 1
+        if self._refs > 8 * (self.cache.maxsize + self.pages.maxsize):
+            self._compact()
+
+    def invalidate_channel(self, channel_id):
+        keys = self._by_channel.pop(channel_id, ())
+        self._refs -= len(keys)
+        for key in keys:
+            self.cache.pop(key)
+            self.pages.pop(key)
+
+    def _compact(self):
+        """Forget reverse-index entries of evicted or expired results"""
+        live = set(self.cache.keys()) | set(self.pages.keys())
+        self._by_channel = {
+            channel: keys & live
+            for channel, keys in self._by_channel.items()
+            if keys & live
+        }
+        self._refs = sum(len(keys) for keys in self._by_channel.values())
+
+result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_BYTES, RESULT_CACHE_TTL, 2000, SEARCH_PAGE_CACHE_TTL)
+
+def post_data(message):
+    """Build the indexed copy of a channel post"""
+    text = (message.text or message.caption or "").strip()
+    if not text:
+        return None
+    title = next((line.strip() for line in text.splitlines() if line.strip()), "")
+    return {
+        "channel_id": message.chat.id,
+        "message_id": message.id,
+        "username": message.chat.username,
+        "text": text,
+        "title": title[:100],
+        "date": message.date
+    }
+
+async def _search_channel(user_client, channel_id, query, limit):
+    posts = []
+    async for message in user_client.search_messages(channel_id, query=query, limit=limit):
+        data = post_data(message)
+        if data:
+            posts.append(data)
+    return posts
+
+async def perform_fast_channel_search(user_client, channels, query, limit=SEARCH_RESULTS_LIMIT):
+    """Search Telegram live across channels in parallel
+
+    At most SEARCH_CONCURRENCY channels are queried at once and each one
+    gets SEARCH_CHANNEL_TIMEOUT seconds. Results are merged as channels
+    finish and the rest are cancelled once `limit` posts are in.
+    `timings` maps channel_id to seconds taken, or "timeout"/"error".
+    """
+    semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+    timings = {}
+
+    async def run(channel_id):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                posts = await asyncio.wait_for(
+                    _search_channel(user_client, channel_id, query, limit),
+                    timeout=SEARCH_CHANNEL_TIMEOUT
+                )
+                timings[channel_id] = time.perf_counter() - start
+                return posts
+            except asyncio.TimeoutError:
+                timings[channel_id] = "timeout"
+            except Exception as e:
+                timings[channel_id] = "error"
+                logger.warning(f"Search in {channel_id} failed: {e}")
+            return []
+
+    tasks = [asyncio.ensure_future(run(channel_id)) for channel_id in channels]
+    posts = []
+    try:
+        for finished in asyncio.as_completed(tasks):
+            posts.extend(await finished)
+            if len(posts) >= limit:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    posts.sort(key=lambda post: post["date"], reverse=True)
+    logger.debug(f"Channel search timings for {query!r}: {timings}")
+    return SearchResult(posts[:limit], timings)
@@ -0,0 +1,179 @@
+import heapq
+import logging
+import re
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from info import FUZZY_THRESHOLD, FUZZY_MAX_CANDIDATES, FUZZY_MAX_POSTINGS
+
+logger = logging.getLogger(__name__)
+
+# Removed documents kept as tombstones before the postings are rebuilt
+COMPACT_MIN = 10000
+
+# Release-name noise that says nothing about which title it is. Only the
+# part from the first year or unambiguous tag on is a release name, and
+# only a word after at least one title word can start it, so "1917",
+# "It" or "English Vinglish" stay whole.
+_YEAR = r"(19|20)\d{2}"
+_RELEASE = (
+    r"\d{3,4}p|4k|uhd|fhd"
+    r"|x ?26[45]|h ?26[45]|hevc|xvid|divx|10 ?bit|hdr10?"
+    r"|aac|ac3|eac3|dts|dd ?[57] ?1|atmos"
+    r"|web ?dl|web ?rip|webdl|bluray|blu ?ray|brrip|bdrip|hdrip|dvdrip|dvdscr|hdtv|hdcam|camrip|predvd|hdts"
+    r"|dual ?audio|multi ?audio|dubbed|esubs?|msubs?"
+    r"|mkv|mp4|avi"
+)
+# Also real words, stripped only inside the release name
+_AMBIGUOUS = (
+    r"2k|hd|sd|hq|avc|8 ?bit|dv|mp3|flac|ddp?|cam|ts"
+    r"|hindi|english|eng|tamil|telugu|malayalam|kannada|bengali|marathi|punjabi|gujarati|urdu|korean|japanese"
+    r"|org|subs?|hc|uncut|proper|repack|complete"
+)
+_RELEASE_START = re.compile(rf" (?:{_YEAR}|{_RELEASE})\b")
+_TAGS = re.compile(rf"\b(?:{_YEAR}|{_RELEASE}|{_AMBIGUOUS})\b")
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize_title(title):
+    """Lowercase title with release tags and punctuation removed"""
+    text = " ".join(_NON_WORD.sub(" ", (title or "").lower()).split())
+    match = _RELEASE_START.search(text)
+    if not match:
+        return text
+    return " ".join((text[:match.start()] + _TAGS.sub(" ", text[match.start():])).split())
+
+def trigrams(normalized):
+    # Spaces are dropped so "iron man" and "ironman" look alike
+    text = f"${normalized.replace(' ', '')}$"
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TrigramIndex:
+    """In-memory trigram index over post titles for fuzzy lookups
+
+    Posting lists are append-only sorted arrays of document numbers, so
+    a few million titles fit in a few hundred MB. Removed and re-added
+    posts leave tombstones that are compacted away once they make up a
+    quarter of the index. It is rebuilt from the Posts titles at startup.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._postings = {}
+        self._docs = []
+        # Channel of each document, an array is much faster to filter by
+        self._channels = array("q")
+        self._by_post = {}
+        self._deleted = set()
+
+    def __len__(self):
+        return len(self._by_post)
+
+    def add(self, post):
+        """Index one post dict with channel_id, message_id and title"""
+        key = (post["channel_id"], post["message_id"])
+        self.remove(*key)
+        grams = trigrams(normalize_title(post.get("title")))
+        if not grams:
+            return
+        doc = len(self._docs)
+        self._docs.append((key[0], key[1], post.get("username"), post.get("title"), len(grams)))
+        self._channels.append(key[0])
+        self._by_post[key] = doc
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("I")
+            postings.append(doc)
+
+    def remove(self, channel_id, message_id):
+        doc = self._by_post.pop((channel_id, message_id), None)
+        if doc is not None:
+            self._deleted.add(doc)
+            if len(self._deleted) > max(COMPACT_MIN, len(self._docs) // 4):
+                self._compact()
+
+    def _compact(self):
+        """Drop tombstones, renumbering the live documents in order"""
+        start = time.perf_counter()
+        remap = [-1] * len(self._docs)
+        docs = []
+        for doc, entry in enumerate(self._docs):
+            if doc not in self._deleted:
+                remap[doc] = len(docs)
+                docs.append(entry)
+        postings = {}
+        for gram, old in self._postings.items():
+            new = array("I", (remap[doc] for doc in old if remap[doc] >= 0))
+            if new:
+                postings[gram] = new
+        self._by_post = {key: remap[doc] for key, doc in self._by_post.items()}
+        self._postings = postings
+        self._docs = docs
+        self._channels = array("q", (entry[0] for entry in docs))
+        self._deleted = set()
+        logger.info(f"Trigram index compacted to {len(docs)} posts in {time.perf_counter() - start:.2f}s")
+
+    def search(self, query, channels=None, limit=10, threshold=FUZZY_THRESHOLD):
+        """Posts whose title is most similar to query, best first"""
+        grams = trigrams(normalize_title(query))
+        lists = sorted(
+            (self._postings[gram] for gram in grams if gram in self._postings),
+            key=len
+        )
+        if not grams or not lists:
+            return []
+
+        # A title reaching the threshold must share at least `need`
+        # trigrams, so it has to appear in one of the shortest lists.
+        # Those are counted, up to FUZZY_MAX_POSTINGS entries, and only
+        # the FUZZY_MAX_CANDIDATES sharing most of them are scored.
+        need = max(1, int(threshold * len(grams)))
+        seed = len(lists) - need + 1
+        if seed <= 0:
+            return []
+        counts = Counter()
+        scanned = 0
+        for postings in lists[:seed]:
+            counts.update(postings)
+            scanned += len(postings)
+            if scanned >= FUZZY_MAX_POSTINGS:
+                break
+        pool = counts.keys() - self._deleted if self._deleted else counts
+        if channels is not None:
+            channel_set = set(channels)
+            channel_of = self._channels
+            pool = [doc for doc in pool if channel_of[doc] in channel_set]
+        candidates = heapq.nlargest(FUZZY_MAX_CANDIDATES, pool, key=counts.__getitem__)
+
+        scored = []
+        for doc in candidates:
+            channel_id, message_id, username, title, size = self._docs[doc]
+            shared = 0
+            for postings in lists:
+                i = bisect_left(postings, doc)
+                if i < len(postings) and postings[i] == doc:
+                    shared += 1
+            score = shared / (len(grams) + size - shared)
+            if score >= threshold:
+                scored.append((score, channel_id, message_id, username, title))
+
+        scored.sort(reverse=True)
+        return [
+            {"channel_id": c, "message_id": m, "username": u, "title": t, "score": s}
+            for s, c, m, u, t in scored[:limit]
+        ]
+
+    async def load(self, col):
+        """Rebuild the index from the stored posts"""
+        start = time.perf_counter()
+        projection = {"_id": 0, "channel_id": 1, "message_id": 1, "username": 1, "title": 1}
+        try:
+            async for post in col.find({}, projection).batch_size(5000):
+                self.add(post)
+            self.loaded = True
+            logger.info(f"Trigram index loaded {len(self)} posts in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            logger.error(f"Trigram index load error: {e}")
+
+trigram_index = TrigramIndex()
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from info import API_ID, API_HASH, ADMIN, USER_SESSION_CHECK_INTERVAL
+from plugins.database import database
+from utils.metrics import MeteredClient
+from utils.cluster import cluster
+
+logger = logging.getLogger(__name__)
+
+class UserSession:
+    """Long-lived user client shared by every search
+
+    With workers only the primary one connects it, one session string
+    must not be connected twice. The others never get a client.
+    """
+
+    def __init__(self):
+        self.client = None
+        self._session = None
+        self._lock = asyncio.Lock()
+        self._last_check = 0
+        # Reloads started by cluster events, kept referenced until done
+        self._reloads = set()
+
+    async def _load_session(self):
+        user = await database.find_user(ADMIN)
+        return user.get("session") if user else None
+
+    async def _connect(self, session):
+        client = MeteredClient(
+            "user_session",
+            metrics_label="user",
+            session_string=session,
+            api_id=API_ID,
+            api_hash=API_HASH,
+            in_memory=True,
+            no_updates=True
+        )
+        await client.start()
+        self.client = client
+        self._session = session
+        self._last_check = time.monotonic()
+        logger.info("User session connected")
+
+    async def _disconnect(self):
+        client, self.client = self.client, None
+        if client:
+            try:
+                await client.stop()
+            except Exception as e:
+                logger.warning(f"User session stop error: {e}")
+
+    async def start(self):
+        async with self._lock:
+            if self.client:
+                return
+            session = await self._load_session()
+            if not session:
+                logger.info("No user session stored, use /login to enable search")
+                return
+            try:
+                await self._connect(session)
+            except Exception as e:
+                logger.error(f"User session start error: {e}")
+
+    async def stop(self):
+        async with self._lock:
+            await self._disconnect()
+            self._session = None
+
+    async def reload(self):
+        """Reconnect with whatever session is currently stored, after /login or /logout
+
+        The process running the session reloads it, wherever this is called.
+        """
+        if cluster.primary:
+            await self._reload()
+        cluster.publish("session")
+
+    def reload_soon(self):
+        """reload() for the cluster event, each one rereads the stored session"""
+        task = asyncio.create_task(self._reload())
+        self._reloads.add(task)
+        task.add_done_callback(self._reloads.discard)
+
+    async def _reload(self):
+        async with self._lock:
+            await self._disconnect()
+            self._session = await self._load_session()
+            if not self._session:
+                logger.info("User session removed")
+                return
+            try:
+                await self._connect(self._session)
+            except Exception as e:
+                logger.error(f"User session reload error: {e}")
+
+    async def available(self):
+        """Whether there is a session to use, also in workers that do not run it"""
+        return bool(self.client or await self._load_session())
+
+    def invalidate(self):
+        """Force a health check on the next get()"""
+        self._last_check = 0
+
+    async def get(self):
+        """Return a connected user client, reconnecting if it went stale"""
+        if not cluster.primary:
+            return None
+        client = self.client
+        if (
+            client and client.is_connected
+            and time.monotonic() - self._last_check < USER_SESSION_CHECK_INTERVAL
+        ):
+            return client
+
+        async with self._lock:
+            if self.client:
+                try:
+                    await asyncio.wait_for(self.client.get_me(), timeout=10)
+                    self._last_check = time.monotonic()
+                    return self.client
+                except Exception as e:
+                    logger.warning(f"User session unhealthy, reconnecting: {e}")
+                    await self._disconnect()
+
+            session = self._session or await self._load_session()
+            if not session:
+                return None
+            try:
+                await self._connect(session)
+            except Exception as e:
+                logger.error(f"User session reconnect error: {e}")
+                return None
+            return self.client
+
+# Global user session shared across plugins
+userbot = UserSession()
+
+@cluster.on("session")
+def _session_changed():
+    # /login or /logout ran in the worker owning the ADMIN chat
+    if cluster.primary:
+        userbot.reload_soon()
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from datetime import datetime
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+class UserWriteBuffer:
+    """Coalesce user upserts and last_seen touches into periodic bulk writes
+
+    add() creates the user if needed, touch() only refreshes last_seen of
+    users that already exist. Repeated writes for one user between two
+    flushes become a single operation.
+    """
+
+    def __init__(self, col, interval, max_pending):
+        self.col = col
+        self.interval = interval
+        self.max_pending = max_pending
+        self.flushed = 0
+        self.on_flush = []
+        self._pending = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _queue(self, user_id, fields, upsert):
+        entry = self._pending.get(user_id)
+        if entry is None:
+            entry = self._pending[user_id] = {"set": {}, "upsert": False, "joined_at": datetime.utcnow()}
+        entry["set"].update(fields)
+        entry["upsert"] = entry["upsert"] or upsert
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+
+    def add(self, user_id, user_name):
+        self._queue(user_id, {"name": user_name, "last_seen": datetime.utcnow()}, True)
+
+    def touch(self, user_id):
+        self._queue(user_id, {"last_seen": datetime.utcnow()}, False)
+
+    def _requeue(self, pending):
+        """Put back a batch that was not written, merged with newer writes"""
+        for user_id, entry in pending.items():
+            newer = self._pending.get(user_id)
+            if newer is not None:
+                entry = {
+                    "set": {**entry["set"], **newer["set"]},
+                    "upsert": entry["upsert"] or newer["upsert"],
+                    "joined_at": entry["joined_at"]
+                }
+            self._pending[user_id] = entry
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return None
+        ops = []
+        for user_id, entry in pending.items():
+            update = {"$set": entry["set"]}
+            if entry["upsert"]:
+                update["$setOnInsert"] = {"joined_at": entry["joined_at"]}
+            ops.append(UpdateOne({"_id": user_id}, update, upsert=entry["upsert"]))
+        try:
+            result = await self.col.bulk_write(ops, ordered=False)
+        except asyncio.CancelledError:
+            self._requeue(pending)
+            raise
+        except Exception as e:
+            logger.error(f"User flush error: {e}")
+            # Writes are idempotent, retry the whole batch next flush
+            self._requeue(pending)
+            return None
+        self.flushed += len(ops)
+        for callback in self.on_flush:
+            callback(result)
+        return result
+
+    async def _loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if not self._task:
+            self._stopping = False
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Let a flush in flight finish, then write what is left"""
+        task, self._task = self._task, None
+        if task:
+            self._stopping = True
+            self._wakeup.set()
+            await task
+        await self.flush()